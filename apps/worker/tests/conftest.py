@@ -15,11 +15,12 @@ def mock_data_fetcher():
     
     # Configure default return values
     mock.get_existing_pages_with_revisions.return_value = []
-    mock.create_page_record.return_value = "page_123"
-    mock.create_page_revision.return_value = "revision_456"
-    mock.update_page_last_seen.return_value = True
-    mock.update_page_revision.return_value = True
+    mock.create_page_records.side_effect = lambda project_id, page_infos: {p["url"]: "page_123" for p in page_infos}
+    mock.create_page_revisions.return_value = {}
+    mock.update_pages_current_revision.return_value = True
+    mock.update_pages_last_seen.return_value = True
     mock.get_revision_by_id.return_value = None
+    mock.get_revisions_by_ids.return_value = {}
     mock.update_run_status.return_value = True
     mock.create_run.return_value = "run_789"
     mock.get_latest_llms_txt_url.return_value = None
@@ -29,6 +30,8 @@ def mock_data_fetcher():
     mock.get_active_webhooks.return_value = []
     mock.log_webhook_event.return_value = True
     mock.get_project_config_with_domain.return_value = None
+    mock.get_sitemap_cache.return_value = None
+    mock.update_sitemap_cache.return_value = True
     
     return mock
 
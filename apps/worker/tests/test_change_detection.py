@@ -4,7 +4,9 @@ import pytest
 from unittest.mock import Mock, patch, MagicMock
 import hashlib
 
-from worker.change_detection import ChangeDetector
+import lxml.html
+
+from worker.change_detection import ChangeDetector, response_validators
 
 
 class TestChangeDetector:
@@ -19,6 +21,7 @@ class TestChangeDetector:
         assert detector.data_fetcher == mock_data_fetcher
         assert detector.session is not None
         assert "User-Agent" in detector.session.headers
+        assert detector.session.get_adapter("https://example.com")._pool_maxsize == 64
 
     @patch('worker.change_detection.requests.Session.get')
     def test_detect_changes_no_sitemap(self, mock_get, mock_data_fetcher):
@@ -40,7 +43,7 @@ class TestChangeDetector:
         
         detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
         
-        with patch.object(detector, '_process_url_batch') as mock_process:
+        with patch.object(detector, '_check_existing_pages') as mock_process:
             mock_process.return_value = {
                 'changed': [],
                 'unchanged': [{"id": "page_123", "url": "https://example.com"}],
@@ -70,7 +73,7 @@ class TestChangeDetector:
         
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.text = sitemap_xml
+        mock_response.content = sitemap_xml.encode('utf-8')
         mock_get.return_value = mock_response
         
         # Mock existing pages
@@ -87,17 +90,41 @@ class TestChangeDetector:
         
         detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
         
-        with patch.object(detector, '_process_url_batch') as mock_process:
+        with patch.object(detector, '_check_existing_pages') as mock_process:
             mock_process.return_value = {
                 'changed': [],
                 'unchanged': [{"id": "page_123", "url": "https://example.com"}],
-                'new': [{"url": "https://example.com/about"}]
+                'new': []
             }
             
             result = detector.detect_changes("https://example.com")
             
             assert result["has_changes"] is True
-            assert result["new_pages"] == [{"url": "https://example.com/about"}]
+            # New sitemap URLs are classified without going through the page checks
+            assert [page["url"] for page in result["new_pages"]] == ["https://example.com/about"]
+            assert result["new_pages"][0]["path"] == "/about"
+            mock_process.assert_called_once()
+            assert mock_process.call_args[0][0] == ["https://example.com"]
+            assert result["total_checked"] == 2
+
+    @patch('worker.change_detection.requests.Session.get')
+    def test_detect_changes_checks_all_pages_in_one_pass(self, mock_get, mock_data_fetcher):
+        """Test every existing page is handed to the fetch pool at once rather than in fixed batches."""
+        mock_get.side_effect = Exception("Sitemap not found")
+        urls = [f"https://example.com/page{i}" for i in range(25)]
+        mock_data_fetcher.get_existing_pages_with_revisions.return_value = [
+            {"id": f"page_{i}", "url": url, "current_revision": None} for i, url in enumerate(urls)
+        ]
+        
+        detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
+        
+        with patch.object(detector, '_check_existing_pages') as mock_process:
+            mock_process.return_value = {'changed': [], 'unchanged': [], 'new': []}
+            
+            detector.detect_changes("https://example.com/page0")
+            
+            mock_process.assert_called_once()
+            assert mock_process.call_args[0][0] == urls
 
     def test_fetch_sitemap_urls_success(self, mock_data_fetcher):
         """Test successful sitemap URL fetching."""
@@ -119,7 +146,7 @@ class TestChangeDetector:
         with patch.object(detector.session, 'get') as mock_get:
             mock_response = Mock()
             mock_response.status_code = 200
-            mock_response.text = sitemap_xml
+            mock_response.content = sitemap_xml.encode('utf-8')
             mock_get.return_value = mock_response
             
             urls = detector._fetch_sitemap_urls("https://example.com")
@@ -129,6 +156,52 @@ class TestChangeDetector:
             assert "https://example.com/about" in urls
             assert "https://example.com/contact" in urls
 
+    def test_fetch_sitemap_urls_not_modified_uses_cache(self, mock_data_fetcher):
+        """Test a 304 for the sitemap returns the cached URLs without parsing."""
+        detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
+        mock_data_fetcher.get_sitemap_cache.return_value = {
+            "sitemap_etag": '"s1"',
+            "sitemap_last_modified": None,
+            "sitemap_urls_cache": ["https://example.com", "https://example.com/about"]
+        }
+        
+        with patch.object(detector.session, 'get') as mock_get, \
+                patch.object(detector, '_read_sitemap') as mock_read:
+            mock_response = Mock()
+            mock_response.status_code = 304
+            mock_get.return_value = mock_response
+            
+            urls = detector._fetch_sitemap_urls("https://example.com")
+            
+            assert urls == ["https://example.com", "https://example.com/about"]
+            assert mock_get.call_args[1]['headers'] == {'If-None-Match': '"s1"'}
+            mock_read.assert_not_called()
+            mock_data_fetcher.update_sitemap_cache.assert_not_called()
+
+    def test_fetch_sitemap_urls_caches_validators(self, mock_data_fetcher):
+        """Test a fetched sitemap's URLs are cached with its validators."""
+        detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
+        
+        sitemap_xml = b"""<?xml version="1.0" encoding="UTF-8"?>
+        <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+            <url><loc>https://example.com/about</loc></url>
+        </urlset>"""
+        
+        with patch.object(detector.session, 'get') as mock_get:
+            mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.content = sitemap_xml
+            mock_response.headers = {"ETag": '"s2"'}
+            mock_get.return_value = mock_response
+            
+            urls = detector._fetch_sitemap_urls("https://example.com")
+            
+            assert urls == ["https://example.com/about"]
+            assert mock_get.call_args[1]['headers'] is None
+            mock_data_fetcher.update_sitemap_cache.assert_called_once_with(
+                "project_123", '"s2"', None, ["https://example.com/about"]
+            )
+
     def test_fetch_sitemap_urls_sitemap_index(self, mock_data_fetcher):
         """Test sitemap index parsing."""
         detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
@@ -154,20 +227,55 @@ class TestChangeDetector:
             # First call returns sitemap index
             mock_response1 = Mock()
             mock_response1.status_code = 200
-            mock_response1.text = sitemap_index_xml
+            mock_response1.content = sitemap_index_xml.encode('utf-8')
             
             # Subsequent calls return sub-sitemaps
             mock_response2 = Mock()
             mock_response2.status_code = 200
-            mock_response2.text = sub_sitemap_xml
+            mock_response2.content = sub_sitemap_xml.encode('utf-8')
             
             mock_get.side_effect = [mock_response1, mock_response2, mock_response2]
             
             urls = detector._fetch_sitemap_urls("https://example.com")
             
-            # Should have URLs from both sub-sitemaps
-            assert len(urls) == 2
-            assert "https://example.com/page1" in urls
+            # Both sub-sitemaps list the same page, which is kept once
+            assert urls == ["https://example.com/page1"]
+            # A sitemap index is never cached
+            mock_data_fetcher.update_sitemap_cache.assert_not_called()
+
+    def test_parse_sitemap_index_dedupes_sub_sitemaps(self, mock_data_fetcher):
+        """Test each sub-sitemap of an index is fetched once, with results kept in index order."""
+        detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
+        
+        sitemap_index_xml = b"""<?xml version="1.0" encoding="UTF-8"?>
+        <sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+            <sitemap><loc>https://example.com/sitemap1.xml</loc></sitemap>
+            <sitemap><loc>https://example.com/sitemap2.xml</loc></sitemap>
+            <sitemap><loc>https://example.com/sitemap1.xml</loc></sitemap>
+        </sitemapindex>"""
+        
+        def get(url, timeout):
+            response = Mock()
+            response.status_code = 200
+            page = url.rsplit("/", 1)[1].replace("sitemap", "page").replace(".xml", "")
+            response.content = (
+                '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                f'<url><loc>https://example.com/{page}</loc></url></urlset>'
+            ).encode('utf-8')
+            return response
+        
+        with patch.object(detector.session, 'get', side_effect=get) as mock_get:
+            urls = detector._parse_sitemap(sitemap_index_xml)
+        
+        assert urls == ["https://example.com/page1", "https://example.com/page2"]
+        assert mock_get.call_count == 2
+
+    def test_parse_sitemap_invalid_xml(self, mock_data_fetcher):
+        """Test malformed sitemap XML is tolerated."""
+        detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
+        
+        assert detector._parse_sitemap(b"<urlset><url><loc>https://example.com") == []
+        assert detector._parse_sitemap(b"not xml at all") == []
 
     def test_normalize_url(self, mock_data_fetcher):
         """Test URL normalization."""
@@ -185,8 +293,8 @@ class TestChangeDetector:
         assert detector._normalize_url("") == ""
         assert detector._normalize_url(None) is None
 
-    def test_process_url_batch_existing_pages(self, mock_data_fetcher):
-        """Test processing URL batch with existing pages."""
+    def test_check_existing_pages(self, mock_data_fetcher):
+        """Test checking existing pages for changes."""
         detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
         
         existing_pages = [
@@ -197,35 +305,58 @@ class TestChangeDetector:
                     "id": "revision_456",
                     "content_sha256": "abc123"
                 }
+            },
+            {
+                "id": "page_124",
+                "url": "https://example.com/broken",
+                "current_revision": None
             }
         ]
+        existing_pages_by_url = {page["url"]: page for page in existing_pages}
         
-        urls = ["https://example.com", "https://example.com/new"]
-        sitemap_urls = ["https://example.com", "https://example.com/new"]
+        urls = ["https://example.com", "https://example.com/broken"]
         
-        with patch.object(detector, '_check_page_changes') as mock_check:
-            mock_check.return_value = {
+        def check(url, existing_page):
+            if url.endswith("/broken"):
+                raise Exception("Unexpected error")
+            return {
                 'has_changed': False,
                 'reason': 'No changes detected',
                 'old_revision_id': 'revision_456'
             }
-            
-            with patch.object(detector, '_get_page_info') as mock_get_info:
-                mock_get_info.return_value = {
-                    "url": "https://example.com/new",
-                    "path": "/new",
-                    "canonical_url": "https://example.com/new",
-                    "render_mode": "STATIC",
-                    "is_indexable": True,
-                    "metadata": {}
-                }
-                
-                result = detector._process_url_batch(urls, existing_pages, sitemap_urls)
-                
-                assert len(result['unchanged']) == 1
-                assert len(result['new']) == 1
-                assert result['unchanged'][0]['url'] == "https://example.com"
-                assert result['new'][0]['url'] == "https://example.com/new"
+        
+        with patch.object(detector, '_check_page_changes', side_effect=check):
+            result = detector._check_existing_pages(urls, existing_pages_by_url)
+        
+        assert len(result['unchanged']) == 1
+        assert result['unchanged'][0]['url'] == "https://example.com"
+        # A page that can't be checked is treated as new to be safe
+        assert len(result['new']) == 1
+        assert result['new'][0]['url'] == "https://example.com/broken"
+
+    def test_check_existing_pages_parallel_keeps_order(self, mock_data_fetcher):
+        """Test URLs checked in parallel come back classified and in order."""
+        detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
+        
+        existing_pages = [
+            {"id": f"page_{i}", "url": f"https://example.com/{i}", "current_revision_id": f"revision_{i}"}
+            for i in range(20)
+        ]
+        urls = [page["url"] for page in existing_pages]
+        
+        def check(url, existing_page):
+            # Odd pages changed
+            changed = int(url.rsplit("/", 1)[1]) % 2 == 1
+            return {'has_changed': changed, 'reason': 'test', 'old_revision_id': existing_page["current_revision_id"]}
+        
+        with patch.object(detector, '_check_page_changes', side_effect=check):
+            result = detector._check_existing_pages(urls, {page["url"]: page for page in existing_pages})
+        
+        assert [p["url"] for p in result['changed']] == urls[1::2]
+        assert [p["url"] for p in result['unchanged']] == urls[0::2]
+        assert result['changed'][0]['old_revision_id'] == "revision_1"
+        assert result['new'] == []
+        assert detector._host_slot("https://example.com/a") is detector._host_slot("https://example.com/b")
 
     @patch('worker.change_detection.requests.Session.get')
     def test_check_content_hash_detailed_no_changes(self, mock_get, mock_data_fetcher):
@@ -235,7 +366,9 @@ class TestChangeDetector:
         # Mock HTTP response
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.text = "<html><body>Test content</body></html>"
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        mock_response.iter_content.return_value = [b"<html><body>Test content</body></html>"]
+        mock_response.encoding = "utf-8"
         mock_get.return_value = mock_response
         
         existing_page = {
@@ -257,6 +390,99 @@ class TestChangeDetector:
             assert result['reason'] == 'No changes detected'
             assert result['old_revision_id'] == 'revision_456'
 
+    @patch('worker.change_detection.requests.Session.get')
+    @patch('worker.change_detection.requests.Session.head')
+    def test_check_content_hash_detailed_not_modified(self, mock_head, mock_get, mock_data_fetcher):
+        """Test a 304 answer to a conditional GET counts as unchanged without hashing."""
+        detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
+        
+        mock_response = Mock()
+        mock_response.status_code = 304
+        mock_get.return_value = mock_response
+        
+        existing_page = {"id": "page_123", "url": "https://example.com"}
+        current_revision = {
+            "id": "revision_456",
+            "content_sha256": "abc123",
+            "metadata": {"etag": '"v1"', "last_modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+        }
+        
+        with patch.object(detector, '_extract_normalized_content') as mock_extract:
+            result = detector._check_content_hash_detailed("https://example.com", existing_page, current_revision)
+            
+            mock_extract.assert_not_called()
+        
+        assert result['has_changed'] is False
+        assert result['old_revision_id'] == 'revision_456'
+        sent_headers = mock_get.call_args.kwargs['headers']
+        assert sent_headers == {
+            'If-None-Match': '"v1"',
+            'If-Modified-Since': "Wed, 01 Jan 2025 00:00:00 GMT"
+        }
+        # A single request per page, no HEAD preflight
+        mock_head.assert_not_called()
+
+    @patch('worker.change_detection.requests.Session.get')
+    def test_check_content_hash_detailed_raw_hash_match(self, mock_get, mock_data_fetcher):
+        """Test byte-identical content is unchanged without parsing the page."""
+        detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
+        
+        body = b"<html><body>Test content</body></html>"
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        mock_response.iter_content.return_value = [body[:10], body[10:]]
+        mock_get.return_value = mock_response
+        
+        current_revision = {
+            "id": "revision_456",
+            "content_sha256": "abc123",
+            "metadata": {"raw_content_sha256": hashlib.sha256(body).hexdigest()}
+        }
+        
+        with patch.object(detector, '_extract_normalized_content') as mock_extract:
+            result = detector._check_content_hash_detailed("https://example.com", {"id": "page_123"}, current_revision)
+            
+            mock_extract.assert_not_called()
+        
+        assert result['has_changed'] is False
+        assert result['old_revision_id'] == 'revision_456'
+        assert mock_get.call_args.kwargs['stream'] is True
+        mock_response.close.assert_called_once()
+
+    @patch('worker.change_detection.requests.Session.get')
+    def test_check_content_hash_detailed_skipped_content(self, mock_get, mock_data_fetcher):
+        """Test pages the crawl wouldn't store are unchanged, without reading their body."""
+        detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
+        
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Type": "application/pdf"}
+        mock_get.return_value = mock_response
+        
+        result = detector._check_content_hash_detailed("https://example.com/file.pdf", {"id": "page_123"}, None)
+        
+        assert result['has_changed'] is False
+        assert 'non-HTML' in result['reason']
+        mock_response.iter_content.assert_not_called()
+        
+        # Oversized bodies without a Content-Length are cut off while streaming
+        mock_response.headers = {"Content-Type": "text/html"}
+        mock_response.iter_content.return_value = [b"<html>", b"<body>", b"</body>"]
+        with patch('worker.change_detection.MAX_PAGE_BYTES', 10):
+            result = detector._check_content_hash_detailed("https://example.com/large", {"id": "page_124"}, None)
+        
+        assert result['has_changed'] is False
+        assert 'oversized' in result['reason']
+
+    def test_response_validators(self):
+        """Test ETag / Last-Modified are picked out of response headers."""
+        assert response_validators({"ETag": '"v1"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT", "Content-Length": "100"}) == {
+            "etag": '"v1"',
+            "last_modified": "Wed, 01 Jan 2025 00:00:00 GMT"
+        }
+        assert response_validators({}) == {}
+
     @patch('worker.change_detection.requests.Session.get')
     def test_check_content_hash_detailed_changes_detected(self, mock_get, mock_data_fetcher):
         """Test content hash check when changes are detected."""
@@ -265,7 +491,9 @@ class TestChangeDetector:
         # Mock HTTP response
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.text = "<html><body>Updated content</body></html>"
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        mock_response.iter_content.return_value = [b"<html><body>Updated content</body></html>"]
+        mock_response.encoding = "utf-8"
         mock_get.return_value = mock_response
         
         existing_page = {
@@ -347,6 +575,45 @@ class TestChangeDetector:
         assert 'Main Title' in result
         assert 'Some content here' in result
 
+    def test_extract_normalized_content_edge_cases(self, mock_data_fetcher):
+        """Test empty input, XML declarations and text following removed tags."""
+        detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
+        
+        assert detector._extract_normalized_content("") == ""
+        assert detector._extract_normalized_content("   ") == ""
+        assert detector._extract_normalized_content(
+            '<?xml version="1.0" encoding="utf-8"?><html><body>Hello</body></html>'
+        ) == "Hello"
+        assert detector._extract_normalized_content(
+            "<body><p>Before</p><script>x()</script> after <iframe>frame</iframe>end</body>"
+        ) == "Before after end"
+        # Ruby annotations were left out by get_text() too
+        assert detector._extract_normalized_content(
+            "<body><ruby>漢<rp>(</rp><rt>kan</rt><rp>)</rp></ruby> text</body>"
+        ) == "漢 text"
+        # Documents with no elements at all have no text rather than failing to parse
+        assert detector._extract_normalized_content("<!DOCTYPE html>") == ""
+        assert detector._extract_normalized_content(b"<!-- only a comment -->", "utf-8") == ""
+        assert detector._extract_normalized_content('<?xml version="1.0" encoding="utf-8"?><!-- only -->') == ""
+
+    def test_content_hash_bytes_matches_str(self, mock_data_fetcher):
+        """Test hashing raw bytes with their encoding matches hashing the decoded text."""
+        detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
+        
+        html = "<html><head><meta charset='utf-8'></head><body>caf\u00e9 <script>x()</script> \u2713</body></html>"
+        for encoding in ("utf-8", "ISO-8859-1"):
+            body = html.encode("utf-8")
+            assert detector._content_hash(body, encoding) == detector._content_hash(body.decode(encoding, errors="replace"))
+
+    def test_content_hash_from_tree_matches_html(self, mock_data_fetcher):
+        """Test hashing an already parsed tree matches hashing the HTML."""
+        detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
+        
+        html = "<html><head><title>T</title><style>p{}</style></head><body><p>Hi</p><script>x()</script> there</body></html>"
+        root = lxml.html.document_fromstring(html)
+        
+        assert detector.content_hash_from_tree(root) == detector._content_hash(html)
+
     def test_get_page_info(self, mock_data_fetcher):
         """Test page info extraction."""
         detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
@@ -360,96 +627,116 @@ class TestChangeDetector:
         assert result["is_indexable"] is True
         assert result["metadata"] == {}
 
-    def test_save_page_revision_no_old_revision(self, mock_data_fetcher):
-        """Test saving page revision when no old revision exists."""
+    def test_save_page_revisions_bulk(self, mock_data_fetcher):
+        """Test changed pages are inserted in one call and unchanged ones only touched."""
         detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
+        mock_data_fetcher.create_page_revisions.return_value = {"page_new": "revision_new"}
         
-        with patch.object(detector, '_extract_normalized_content') as mock_extract:
-            mock_extract.return_value = "normalized content"
-            
-            result = detector.save_page_revision(
-                page_id="page_123",
-                content="<html>Test content</html>",
-                title="Test Page",
-                description="Test description",
-                metadata={"test": "value"}
-            )
-            
-            assert result == "revision_456"
-            mock_data_fetcher.create_page_revision.assert_called_once()
-            mock_data_fetcher.update_page_revision.assert_called_once_with("page_123", "revision_456")
+        result = detector.save_page_revisions([
+            {
+                "page_id": "page_same",
+                "content": "<html>Same</html>",
+                "old_revision_id": "revision_old",
+                "content_hash": "abc123",
+                "cached_old_revision": {"id": "revision_old", "content_sha256": "abc123"}
+            },
+            {
+                "page_id": "page_new",
+                "content": "<html>New</html>",
+                "title": "New",
+                "content_hash": "def456",
+                "metadata": {"change_reason": "New page"}
+            }
+        ])
+        
+        assert result == {"page_same": "revision_old", "page_new": "revision_new"}
+        mock_data_fetcher.update_pages_last_seen.assert_called_once_with(["page_same"])
+        run_id, rows = mock_data_fetcher.create_page_revisions.call_args[0]
+        assert run_id == "run_456"
+        assert [row["page_id"] for row in rows] == ["page_new"]
+        assert rows[0]["metadata"] == {"change_reason": "New page", "hash_algorithm": "sha256"}
+        mock_data_fetcher.update_pages_current_revision.assert_called_once_with({"page_new": "revision_new"})
+        mock_data_fetcher.get_revision_by_id.assert_not_called()
 
-    def test_save_page_revision_with_unchanged_content(self, mock_data_fetcher):
-        """Test saving page revision when content hasn't changed."""
+    def test_save_page_revisions_isolates_failures(self, mock_data_fetcher):
+        """Test a bad page or a failed bulk insert doesn't drop the other pages' revisions."""
         detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
         
-        # Mock old revision with same content hash
-        old_revision = {
-            "id": "revision_456",
-            "content_sha256": hashlib.sha256("normalized content".encode('utf-8')).hexdigest()
-        }
-        mock_data_fetcher.get_revision_by_id.return_value = old_revision
+        def create_page_revisions(run_id, rows):
+            # The bulk insert fails because of page_bad_row; single-row inserts of the others succeed
+            if any(row["page_id"] == "page_bad_row" for row in rows):
+                return {}
+            return {row["page_id"]: f"revision_{row['page_id']}" for row in rows}
+        mock_data_fetcher.create_page_revisions.side_effect = create_page_revisions
+        
+        with patch.object(detector, '_content_hash', side_effect=Exception("unparseable")):
+            result = detector.save_page_revisions([
+                {"page_id": "page_unhashable", "content": "<!DOCTYPE html>"},
+                {"page_id": "page_a", "content": "<html>A</html>", "content_hash": "aaa"},
+                {"page_id": "page_bad_row", "content": "<html>Bad</html>", "content_hash": "bbb"},
+                {"page_id": "page_c", "content": "<html>C</html>", "content_hash": "ccc"}
+            ])
+        
+        assert result == {"page_a": "revision_page_a", "page_c": "revision_page_c"}
+        mock_data_fetcher.update_pages_current_revision.assert_called_once_with(result)
+
+    def test_save_page_revisions_current_revision_update_fails(self, mock_data_fetcher):
+        """Test revisions aren't reported as saved when the pages can't be pointed at them."""
+        detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
+        mock_data_fetcher.create_page_revisions.return_value = {"page_new": "revision_new"}
+        mock_data_fetcher.update_pages_current_revision.return_value = False
         
-        with patch.object(detector, '_extract_normalized_content') as mock_extract:
-            mock_extract.return_value = "normalized content"
-            
-            result = detector.save_page_revision(
-                page_id="page_123",
-                content="<html>Test content</html>",
-                title="Test Page",
-                description="Test description",
-                old_revision_id="revision_456"
-            )
-            
-            # Should return existing revision ID without creating new one
-            assert result == "revision_456"
-            mock_data_fetcher.update_page_last_seen.assert_called_once_with("page_123")
-            mock_data_fetcher.create_page_revision.assert_not_called()
+        result = detector.save_page_revisions([
+            {"page_id": "page_new", "content": "<html>New</html>", "content_hash": "def456"}
+        ])
+        
+        assert result == {}
 
-    def test_save_page_revision_with_changed_content(self, mock_data_fetcher):
-        """Test saving page revision when content has changed."""
+    @patch('worker.change_detection.requests.Session.get')
+    def test_check_content_hash_detailed_other_hash_algorithm(self, mock_get, mock_data_fetcher):
+        """Test a revision hashed with a different algorithm is never compared."""
         detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
         
-        # Mock old revision with different content hash
-        old_revision = {
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        mock_response.iter_content.return_value = [b"<html><body>Test content</body></html>"]
+        mock_response.encoding = "utf-8"
+        mock_get.return_value = mock_response
+        
+        current_revision = {
             "id": "revision_456",
-            "content_sha256": hashlib.sha256("old content".encode('utf-8')).hexdigest()
+            "content_sha256": hashlib.sha256("test content".encode('utf-8')).hexdigest(),
+            "metadata": {"hash_algorithm": "blake3"}
         }
-        mock_data_fetcher.get_revision_by_id.return_value = old_revision
-        mock_data_fetcher.create_page_revision.return_value = "revision_789"
         
-        with patch.object(detector, '_extract_normalized_content') as mock_extract:
-            mock_extract.return_value = "new content"
-            
-            result = detector.save_page_revision(
-                page_id="page_123",
-                content="<html>New content</html>",
-                title="Test Page",
-                description="Test description",
-                old_revision_id="revision_456"
-            )
-            
-            assert result == "revision_789"
-            mock_data_fetcher.create_page_revision.assert_called_once()
-            mock_data_fetcher.update_page_revision.assert_called_once_with("page_123", "revision_789")
+        with patch.object(detector, '_extract_normalized_content', return_value="test content"):
+            result = detector._check_content_hash_detailed("https://example.com", {"id": "page_123"}, current_revision)
+        
+        assert result['has_changed'] is True
+        assert result['old_revision_id'] == 'revision_456'
 
-    def test_save_page_revision_error_handling(self, mock_data_fetcher):
-        """Test error handling in save_page_revision."""
+    def test_save_page_revisions_fetches_old_revision(self, mock_data_fetcher):
+        """Test the old revision is fetched when not cached and a changed page gets a new revision."""
         detector = ChangeDetector("project_123", "run_456", mock_data_fetcher)
         
-        # Mock data fetcher to raise exception
-        mock_data_fetcher.create_page_revision.side_effect = Exception("Database error")
-        
-        with patch.object(detector, '_extract_normalized_content') as mock_extract:
-            mock_extract.return_value = "normalized content"
-            
-            result = detector.save_page_revision(
-                page_id="page_123",
-                content="<html>Test content</html>",
-                title="Test Page"
-            )
-            
-            assert result is None
+        mock_data_fetcher.get_revision_by_id.return_value = {
+            "id": "revision_456",
+            "content_sha256": hashlib.sha256("old content".encode('utf-8')).hexdigest()
+        }
+        mock_data_fetcher.create_page_revisions.return_value = {"page_123": "revision_789"}
+        
+        with patch.object(detector, '_extract_normalized_content', return_value="new content"):
+            result = detector.save_page_revisions([{
+                "page_id": "page_123",
+                "content": "<html>New content</html>",
+                "title": "Test Page",
+                "old_revision_id": "revision_456"
+            }])
+        
+        assert result == {"page_123": "revision_789"}
+        mock_data_fetcher.get_revision_by_id.assert_called_once_with("revision_456")
+        mock_data_fetcher.update_pages_current_revision.assert_called_once_with({"page_123": "revision_789"})
 
     def test_check_page_changes_error_handling(self, mock_data_fetcher):
         """Test error handling in check_page_changes."""
@@ -4,16 +4,27 @@ import pytest
 from unittest.mock import Mock, patch, MagicMock
 import requests
 
+from worker import crawler
 from worker.crawler import (
     crawl_with_change_detection,
-    _create_page_record,
+    _create_page_records,
     normalize_url,
     is_same_domain,
     extract_text_and_meta,
-    Robots
+    Robots,
+    _RequestPacer,
+    _fetch_page
 )
 
 
+@pytest.fixture(autouse=True)
+def reset_crawl_session():
+    """Give each test a fresh process-wide crawl session (tests patch requests.Session)."""
+    crawler._session = None
+    yield
+    crawler._session = None
+
+
 class TestCrawlerBusinessLogic:
     """Test cases for crawler business logic."""
 
@@ -41,6 +52,7 @@ class TestCrawlerBusinessLogic:
         assert normalize_url("https://example.com", "tel:+1234567890") is None
         assert normalize_url("https://example.com", "javascript:alert('test')") is None
         assert normalize_url("https://example.com", "ftp://example.com") is None
+        assert normalize_url("https://example.com", "data:text/html,<p>hi</p>") is None
         
         # Test empty or None URLs
         assert normalize_url("https://example.com", "") is None
@@ -103,7 +115,14 @@ class TestCrawlerBusinessLogic:
         assert result["title"] == ""
         assert result["description"] == ""
 
-    def test_create_page_record_success(self, mock_data_fetcher):
+    def test_extract_text_and_meta_declaration_without_elements(self):
+        """Test a page with an XML declaration but no elements doesn't fail extraction."""
+        result = extract_text_and_meta('<?xml version="1.0" encoding="utf-8"?><!-- only -->', "https://example.com")
+        
+        assert result["title"] == ""
+        assert result["description"] == ""
+
+    def test_create_page_records_success(self, mock_data_fetcher):
         """Test successful page record creation."""
         page_info = {
             "url": "https://example.com",
@@ -114,20 +133,20 @@ class TestCrawlerBusinessLogic:
             "metadata": {"test": "value"}
         }
         
-        result = _create_page_record(mock_data_fetcher, "project_123", page_info)
+        result = _create_page_records(mock_data_fetcher, "project_123", [page_info])
         
-        assert result == "page_123"
-        mock_data_fetcher.create_page_record.assert_called_once_with("project_123", page_info)
+        assert result == {"https://example.com": "page_123"}
+        mock_data_fetcher.create_page_records.assert_called_once_with("project_123", [page_info])
 
-    def test_create_page_record_failure(self, mock_data_fetcher):
+    def test_create_page_records_failure(self, mock_data_fetcher):
         """Test page record creation failure."""
-        mock_data_fetcher.create_page_record.return_value = None
+        mock_data_fetcher.create_page_records.side_effect = Exception("insert failed")
         
         page_info = {"url": "https://example.com"}
         
-        result = _create_page_record(mock_data_fetcher, "project_123", page_info)
+        result = _create_page_records(mock_data_fetcher, "project_123", [page_info])
         
-        assert result is None
+        assert result == {}
 
     @patch('worker.crawler.ChangeDetector')
     def test_crawl_with_change_detection_no_changes(self, mock_change_detector_class, mock_data_fetcher):
@@ -189,7 +208,7 @@ class TestCrawlerBusinessLogic:
         }
         
         # Mock page revision saving
-        mock_detector.save_page_revision.return_value = "revision_789"
+        mock_detector.save_page_revisions.side_effect = lambda revisions: {r["page_id"]: "revision_789" for r in revisions}
         mock_change_detector_class.return_value = mock_detector
         
         # Mock session and response
@@ -197,6 +216,10 @@ class TestCrawlerBusinessLogic:
         mock_response = Mock()
         mock_response.status_code = 200
         mock_response.text = "<html><title>Test Page</title><meta name='description' content='Test description'></html>"
+        mock_response.content = mock_response.text.encode("utf-8")
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        mock_response.encoding = "utf-8"
+        mock_response.iter_content.return_value = [mock_response.content]
         mock_session.get.return_value = mock_response
         mock_session_class.return_value = mock_session
         
@@ -215,6 +238,8 @@ class TestCrawlerBusinessLogic:
         assert len(result["pages"]) == 2
         assert result["changed_pages"] == [{"id": "page_123", "url": "https://example.com", "change_reason": "Content hash changed", "old_revision_id": "revision_456"}]
         assert result["new_pages"] == [{"url": "https://example.com/about", "path": "/about", "canonical_url": "https://example.com/about", "render_mode": "STATIC", "is_indexable": True, "metadata": {}}]
+        # Old revisions not loaded by change detection are fetched in one batch
+        mock_data_fetcher.get_revisions_by_ids.assert_called_once_with(["revision_456"])
 
     @patch('worker.crawler.ChangeDetector')
     @patch('worker.crawler.requests.Session')
@@ -280,7 +305,7 @@ class TestCrawlerBusinessLogic:
         }
         
         # Mock page revision saving
-        mock_detector.save_page_revision.return_value = "revision_789"
+        mock_detector.save_page_revisions.side_effect = lambda revisions: {r["page_id"]: "revision_789" for r in revisions}
         mock_change_detector_class.return_value = mock_detector
         
         # Mock session and response
@@ -288,6 +313,10 @@ class TestCrawlerBusinessLogic:
         mock_response = Mock()
         mock_response.status_code = 200
         mock_response.text = "<html><title>New Page</title></html>"
+        mock_response.content = mock_response.text.encode("utf-8")
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        mock_response.encoding = "utf-8"
+        mock_response.iter_content.return_value = [mock_response.content]
         mock_session.get.return_value = mock_response
         mock_session_class.return_value = mock_session
         
@@ -301,11 +330,50 @@ class TestCrawlerBusinessLogic:
             delay=0.5
         )
         
-        # Verify that create_page_record was called for the new page
-        mock_data_fetcher.create_page_record.assert_called_once()
+        # Verify the new page record was created in a single bulk insert
+        mock_data_fetcher.create_page_records.assert_called_once()
+        assert [p["url"] for p in mock_data_fetcher.create_page_records.call_args[0][1]] == ["https://example.com/new"]
+        
+        # Verify the new page's revision was saved in the single bulk write
+        mock_detector.save_page_revisions.assert_called_once()
+        saved = mock_detector.save_page_revisions.call_args[0][0]
+        assert [r["page_id"] for r in saved] == ["page_123"]
+        assert saved[0]["old_revision_id"] is None
+        # The new page is hashed from the tree parsed for its metadata
+        mock_detector.content_hash_from_tree.assert_called_once()
+        assert saved[0]["content_hash"] == mock_detector.content_hash_from_tree.return_value
+        assert result["pages"][0]["revision_id"] == "revision_789"
+
+    @patch('worker.crawler.ChangeDetector')
+    @patch('worker.crawler.requests.Session')
+    def test_crawl_with_change_detection_skipped_new_page_is_recorded(self, mock_session_class, mock_change_detector_class, mock_data_fetcher):
+        """Test a new non-HTML page gets a page record but no revision."""
+        mock_detector = Mock()
+        mock_detector.detect_changes.return_value = {
+            "has_changes": True,
+            "changed_pages": [],
+            "new_pages": [{"url": "https://example.com/file.pdf", "path": "/file.pdf", "metadata": {}}],
+            "unchanged_pages": []
+        }
+        mock_change_detector_class.return_value = mock_detector
         
-        # Verify that save_page_revision was called
-        mock_detector.save_page_revision.assert_called_once()
+        mock_session = Mock()
+        mock_session.get.return_value = Mock(status_code=200, headers={"Content-Type": "application/pdf"})
+        mock_session_class.return_value = mock_session
+        
+        result = crawl_with_change_detection(
+            start_url="https://example.com",
+            project_id="project_123",
+            run_id="run_456",
+            data_fetcher=mock_data_fetcher,
+            delay=0
+        )
+        
+        created = mock_data_fetcher.create_page_records.call_args[0][1]
+        assert [p["url"] for p in created] == ["https://example.com/file.pdf"]
+        assert created[0]["metadata"] == {"content_skipped": True}
+        mock_detector.save_page_revisions.assert_not_called()
+        assert result["pages"] == []
 
     @patch('worker.crawler.ChangeDetector')
     def test_crawl_with_change_detection_max_pages_limit(self, mock_change_detector_class, mock_data_fetcher):
@@ -321,7 +389,7 @@ class TestCrawlerBusinessLogic:
             "new_pages": [],
             "unchanged_pages": []
         }
-        mock_detector.save_page_revision.return_value = "revision_789"
+        mock_detector.save_page_revisions.side_effect = lambda revisions: {r["page_id"]: "revision_789" for r in revisions}
         mock_change_detector_class.return_value = mock_detector
         
         result = crawl_with_change_detection(
@@ -347,6 +415,10 @@ class TestCrawlerBusinessLogic:
         mock_response = Mock()
         mock_response.status_code = 200
         mock_response.text = "<html><head><title>Test Page</title></head><body>Content</body></html>"
+        mock_response.content = mock_response.text.encode("utf-8")
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        mock_response.encoding = "utf-8"
+        mock_response.iter_content.return_value = [mock_response.content]
         mock_session.get.return_value = mock_response
         mock_session_class.return_value = mock_session
         
@@ -363,7 +435,7 @@ class TestCrawlerBusinessLogic:
             "new_pages": [],
             "unchanged_pages": []
         }
-        mock_detector.save_page_revision.return_value = "revision_789"
+        mock_detector.save_page_revisions.side_effect = lambda revisions: {r["page_id"]: "revision_789" for r in revisions}
         mock_change_detector_class.return_value = mock_detector
         
         result = crawl_with_change_detection(
@@ -442,6 +514,83 @@ class TestCrawlerBusinessLogic:
             mock_session.headers.update.assert_called_with({"User-Agent": "CustomBot/1.0"})
 
 
+    def test_get_crawl_session_is_shared(self):
+        """Test crawls reuse one pooled session per process."""
+        session = crawler.get_crawl_session()
+        
+        assert crawler.get_crawl_session() is session
+        adapter = session.get_adapter("https://example.com")
+        assert adapter._pool_maxsize == 64
+        assert adapter.max_retries.status_forcelist == (500, 502, 503, 504)
+        assert session.headers["User-Agent"] == crawler.DEFAULT_USER_AGENT
+
+    @patch('worker.crawler.ChangeDetector')
+    def test_crawl_clears_shared_session_cookies(self, mock_change_detector_class, mock_data_fetcher):
+        """Test cookies from an earlier crawl don't carry over to the next one."""
+        mock_change_detector_class.return_value.detect_changes.return_value = {
+            "has_changes": False,
+            "changed_pages": [],
+            "new_pages": [],
+            "unchanged_pages": []
+        }
+        session = crawler.get_crawl_session()
+        session.cookies.set("variant", "b", domain="example.com")
+        
+        crawl_with_change_detection(
+            start_url="https://example.com",
+            project_id="project_123",
+            run_id="run_456",
+            data_fetcher=mock_data_fetcher
+        )
+        
+        assert len(session.cookies) == 0
+
+    def test_request_pacer_spaces_starts(self):
+        """Test request starts are spaced by the delay, the first one immediately."""
+        pacer = _RequestPacer(0.5)
+        
+        with patch('worker.crawler.time.monotonic', return_value=100.0), \
+                patch('worker.crawler.time.sleep') as mock_sleep:
+            pacer._next_start = 100.0
+            pacer.wait()
+            pacer.wait()
+            pacer.wait()
+        
+        assert [c.args[0] for c in mock_sleep.call_args_list] == [0.5, 1.0]
+
+    def test_fetch_page_skips_non_html_and_oversized(self):
+        """Test non-HTML and oversized pages come back without a body, which isn't read."""
+        session = Mock()
+        pacer = _RequestPacer(0)
+        
+        pdf = Mock(status_code=200, headers={"Content-Type": "application/pdf"})
+        session.get.return_value = pdf
+        assert _fetch_page(session, "https://example.com/file.pdf", pacer) == (pdf, None)
+        pdf.iter_content.assert_not_called()
+        pdf.close.assert_called_once()
+        
+        large = Mock(status_code=200, headers={"Content-Type": "text/html", "Content-Length": str(10 * 1024 * 1024)})
+        session.get.return_value = large
+        assert _fetch_page(session, "https://example.com/large", pacer) == (large, None)
+        large.iter_content.assert_not_called()
+        
+        with patch('worker.crawler.MAX_PAGE_BYTES', 10):
+            chunked = Mock(status_code=200, headers={"Content-Type": "text/html"})
+            chunked.iter_content.return_value = [b"<html>", b"<body>", b"</body>"]
+            session.get.return_value = chunked
+            assert _fetch_page(session, "https://example.com/chunked", pacer) == (chunked, None)
+        
+        missing = Mock(status_code=404)
+        session.get.return_value = missing
+        assert _fetch_page(session, "https://example.com/missing", pacer) is None
+        
+        page = Mock(status_code=200, headers={"Content-Type": "text/html; charset=utf-8"})
+        page.iter_content.return_value = [b"<html>", b"</html>"]
+        session.get.return_value = page
+        assert _fetch_page(session, "https://example.com/", pacer) == (page, b"<html></html>")
+        assert session.get.call_args.kwargs["stream"] is True
+
+
 class TestRobots:
     """Test cases for Robots class."""
 
@@ -527,3 +676,37 @@ class TestRobots:
         # No rules should default to allow
         assert robots.allows("/") is True
         assert robots.allows("/admin/") is True
+
+    def test_robots_parses_rules_once_per_fetch(self):
+        """Test robots.txt rules are parsed once and reparsed after a new fetch."""
+        session = Mock()
+        robots = Robots("https://example.com", session, "TestBot/1.0")
+        robots._fetched = True
+        robots._rules_lines = ["User-agent: *", "Disallow: /admin/"]
+        
+        with patch.object(robots, '_parse_rules', wraps=robots._parse_rules) as parse_rules:
+            assert robots.allows("/admin/") is False
+            assert robots.allows("/admin/") is False
+            assert robots.allows("/public/") is True
+            assert parse_rules.call_count == 1
+        
+        session.get.return_value = Mock(status_code=200, text="User-agent: *\nDisallow: /public/")
+        robots.fetch()
+        assert robots.allows("/public/") is False
+        assert robots.allows("/admin/") is True
+
+    def test_robots_uses_own_user_agent_group(self):
+        """Test the group naming our user agent replaces the User-agent: * group."""
+        session = Mock()
+        robots = Robots("https://example.com", session, "TestBot/1.0")
+        robots._fetched = True
+        robots._rules_lines = [
+            "User-agent: TestBot",
+            "Disallow: /private/",
+            "",
+            "User-agent: *",
+            "Disallow: /"
+        ]
+        
+        assert robots.allows("/public/page") is True
+        assert robots.allows("/private/page") is False
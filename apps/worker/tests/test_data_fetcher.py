@@ -160,27 +160,21 @@ class TestDataFetcher:
         mock_client = Mock()
         mock_get_client.return_value = mock_client
         
-        # Mock pages data
+        # Pages come back with their current revision embedded
         pages_data = [
             {
                 "id": "page_123",
                 "url": "https://example.com",
-                "current_revision_id": "revision_456"
-            }
-        ]
-        
-        # Mock revisions data
-        revisions_data = [
-            {
-                "id": "revision_456",
-                "content_sha256": "abc123",
-                "created_at": "2024-01-01T00:00:00Z"
+                "current_revision_id": "revision_456",
+                "current_revision": {
+                    "id": "revision_456",
+                    "content_sha256": "abc123",
+                    "created_at": "2024-01-01T00:00:00Z"
+                }
             }
         ]
         
-        # Configure mock responses
-        mock_client.table.return_value.select.return_value.eq.return_value.execute.return_value.data = pages_data
-        mock_client.table.return_value.select.return_value.in_.return_value.execute.return_value.data = revisions_data
+        mock_client.table.return_value.select.return_value.eq.return_value.order.return_value.range.return_value.execute.return_value.data = pages_data
         
         fetcher = DataFetcher()
         result = fetcher.get_existing_pages_with_revisions("project_123")
@@ -188,49 +182,127 @@ class TestDataFetcher:
         assert len(result) == 1
         assert result[0]["id"] == "page_123"
         assert result[0]["current_revision"]["id"] == "revision_456"
+        # One query, with the revision joined server-side
+        mock_client.table.assert_called_once_with("pages")
+        assert "current_revision:page_revisions!pages_current_revision_id_fkey(" in mock_client.table.return_value.select.call_args[0][0]
 
     @patch('worker.data_fetcher.get_supabase_client')
-    def test_create_page_record_success(self, mock_get_client):
-        """Test successful page record creation."""
+    @patch('worker.data_fetcher.DB_PAGE_SIZE', 2)
+    def test_get_existing_pages_with_revisions_pages_through_results(self, mock_get_client):
+        """Test pages are read in DB_PAGE_SIZE chunks until a short page comes back."""
         mock_client = Mock()
         mock_get_client.return_value = mock_client
-        mock_client.table.return_value.insert.return_value.execute.return_value.data = [{"id": "page_123"}]
-        
-        page_info = {
-            "url": "https://example.com",
-            "path": "/",
-            "canonical_url": "https://example.com",
-            "render_mode": "STATIC",
-            "is_indexable": True,
-            "metadata": {}
-        }
+        
+        query = mock_client.table.return_value.select.return_value.eq.return_value.order.return_value
+        query.range.return_value.execute.side_effect = [
+            Mock(data=[{"id": "page_1"}, {"id": "page_2"}]),
+            Mock(data=[{"id": "page_3"}])
+        ]
+        
+        fetcher = DataFetcher()
+        result = fetcher.get_existing_pages_with_revisions("project_123")
+        
+        assert [page["id"] for page in result] == ["page_1", "page_2", "page_3"]
+        assert [c.args for c in query.range.call_args_list] == [(0, 1), (2, 3)]
+
+    @patch('worker.data_fetcher.get_supabase_client')
+    def test_create_page_records_success(self, mock_get_client):
+        """Test several page records are created in one upsert on (project_id, url)."""
+        mock_client = Mock()
+        mock_get_client.return_value = mock_client
+        upsert = mock_client.table.return_value.upsert
+        upsert.return_value.execute.return_value.data = [
+            {"id": "page_1", "url": "https://example.com/a"},
+            {"id": "page_2", "url": "https://example.com/b"}
+        ]
         
         fetcher = DataFetcher()
-        result = fetcher.create_page_record("project_123", page_info)
+        result = fetcher.create_page_records("project_123", [
+            {"url": "https://example.com/a", "path": "/a"},
+            {"url": "https://example.com/b", "path": "/b"}
+        ])
         
-        assert result == "page_123"
+        assert result == {"https://example.com/a": "page_1", "https://example.com/b": "page_2"}
         mock_client.table.assert_called_with("pages")
+        rows = upsert.call_args[0][0]
+        assert [row["path"] for row in rows] == ["/a", "/b"]
+        assert all(row["project_id"] == "project_123" for row in rows)
+        upsert.assert_called_once()
+        assert upsert.call_args.kwargs == {"on_conflict": "project_id,url", "ignore_duplicates": True}
+        mock_client.table.return_value.select.assert_not_called()
 
     @patch('worker.data_fetcher.get_supabase_client')
-    def test_create_page_revision_success(self, mock_get_client):
-        """Test successful page revision creation."""
+    def test_create_page_records_looks_up_existing_pages(self, mock_get_client):
+        """Test pages that already exist are left as they are and their ids looked up."""
         mock_client = Mock()
         mock_get_client.return_value = mock_client
-        mock_client.table.return_value.insert.return_value.execute.return_value.data = [{"id": "revision_456"}]
+        table = mock_client.table.return_value
+        table.upsert.return_value.execute.return_value.data = [{"id": "page_1", "url": "https://example.com/a"}]
+        lookup = table.select.return_value.eq.return_value.in_
+        lookup.return_value.execute.return_value.data = [{"id": "page_2", "url": "https://example.com/b"}]
         
         fetcher = DataFetcher()
-        result = fetcher.create_page_revision(
-            page_id="page_123",
-            run_id="run_789",
-            content="<html>Test content</html>",
-            content_hash="abc123def456",
-            title="Test Page",
-            description="Test description",
-            metadata={"test": "value"}
-        )
+        result = fetcher.create_page_records("project_123", [
+            {"url": "https://example.com/a"},
+            {"url": "https://example.com/b"}
+        ])
+        
+        assert result == {"https://example.com/a": "page_1", "https://example.com/b": "page_2"}
+        table.select.return_value.eq.assert_called_once_with("project_id", "project_123")
+        lookup.assert_called_once_with("url", ["https://example.com/b"])
+
+    @patch('worker.data_fetcher.get_supabase_client')
+    def test_get_revisions_by_ids_success(self, mock_get_client):
+        """Test fetching several revisions in one query."""
+        mock_client = Mock()
+        mock_get_client.return_value = mock_client
+        mock_client.table.return_value.select.return_value.in_.return_value.execute.return_value.data = [
+            {"id": "revision_1", "content_sha256": "abc"},
+            {"id": "revision_2", "content_sha256": "def"}
+        ]
+        
+        fetcher = DataFetcher()
+        result = fetcher.get_revisions_by_ids(["revision_1", "revision_2"])
         
-        assert result == "revision_456"
-        mock_client.table.assert_called_with("page_revisions")
+        assert set(result) == {"revision_1", "revision_2"}
+        assert result["revision_2"]["content_sha256"] == "def"
+        mock_client.table.return_value.select.assert_called_once_with("id, content_sha256, metadata")
+        mock_client.table.return_value.select.return_value.in_.assert_called_once_with("id", ["revision_1", "revision_2"])
+
+    @patch('worker.data_fetcher.get_supabase_client')
+    def test_create_page_revisions_success(self, mock_get_client):
+        """Test several page revisions are created in one insert."""
+        mock_client = Mock()
+        mock_get_client.return_value = mock_client
+        mock_client.table.return_value.insert.return_value.execute.return_value.data = [
+            {"id": "revision_1", "page_id": "page_1"},
+            {"id": "revision_2", "page_id": "page_2"}
+        ]
+        
+        fetcher = DataFetcher()
+        result = fetcher.create_page_revisions("run_789", [
+            {"page_id": "page_1", "content": "<html>1</html>", "content_hash": "abc"},
+            {"page_id": "page_2", "content": "<html>2</html>", "content_hash": "def", "title": "Two"}
+        ])
+        
+        assert result == {"page_1": "revision_1", "page_2": "revision_2"}
+        rows = mock_client.table.return_value.insert.call_args[0][0]
+        assert [row["content_sha256"] for row in rows] == ["abc", "def"]
+        assert rows[1]["run_id"] == "run_789"
+        assert rows[1]["title"] == "Two"
+
+    @patch('worker.data_fetcher.get_supabase_client')
+    def test_update_pages_current_revision(self, mock_get_client):
+        """Test pages are pointed at their new revisions through one RPC call."""
+        mock_client = Mock()
+        mock_get_client.return_value = mock_client
+        
+        fetcher = DataFetcher()
+        assert fetcher.update_pages_current_revision({"page_1": "revision_1", "page_2": "revision_2"}) is True
+        mock_client.rpc.assert_called_once_with('set_pages_current_revision', {
+            'page_ids': ["page_1", "page_2"],
+            'revision_ids': ["revision_1", "revision_2"]
+        })
 
     @patch('worker.data_fetcher.get_supabase_client')
     def test_get_latest_llms_txt_url_success(self, mock_get_client):
@@ -340,9 +412,8 @@ class TestDataFetcher:
         assert fetcher.update_project_last_run("project_123", "2024-01-01T00:00:00Z") is False
         assert fetcher.create_run("project_123") is None
         assert fetcher.update_run_status("run_123", RUN_STATUS_IN_PROGRESS) is False
-        assert fetcher.get_existing_pages_with_revisions("project_123") == []
-        assert fetcher.create_page_record("project_123", {}) is None
-        assert fetcher.create_page_revision("page_123", "run_789", "content", "hash") is None
+        with pytest.raises(Exception, match="Database connection failed"):
+            fetcher.get_existing_pages_with_revisions("project_123")
         assert fetcher.get_latest_llms_txt_url("project_123") is None
         assert fetcher.create_artifact_record("project_123", "run_789", "file.txt", "content", "url") is None
         assert fetcher.get_active_webhooks("project_123") == []
@@ -0,0 +1,392 @@
+"""Unit tests for the job pipeline business logic."""
+
+import pytest
+from unittest.mock import Mock, patch
+
+import worker.pipeline as pipeline
+from worker.pipeline import process_job_payload
+from worker.constants import (
+    RUN_STATUS_IN_PROGRESS,
+    RUN_STATUS_COMPLETE_NO_DIFFS,
+    RUN_STATUS_COMPLETE_WITH_DIFFS,
+    RUN_STATUS_FAILED
+)
+
+
+class TestJobPipeline:
+    """Test cases for the job pipeline business logic."""
+
+    def test_process_job_payload_success(self, sample_job_payload, sample_crawl_result):
+        """Test successful job processing."""
+        with patch.object(pipeline, 'DataFetcher') as mock_data_fetcher_class, \
+             patch.object(pipeline, 'crawl_with_change_detection') as mock_crawl, \
+             patch.object(pipeline, 'generate_llms_text') as mock_generate, \
+             patch.object(pipeline, 'maybe_upload_s3_from_memory') as mock_upload, \
+             patch.object(pipeline, 'update_run_status') as mock_update_status:
+            
+            # Setup mocks
+            mock_data_fetcher = Mock()
+            mock_data_fetcher_class.return_value = mock_data_fetcher
+            
+            mock_crawl.return_value = sample_crawl_result
+            mock_generate.return_value = "# Test Content\n\nTest llms.txt content"
+            mock_upload.return_value = "https://example.com/llms_123.txt"
+            mock_update_status.return_value = True
+            
+            result = process_job_payload(sample_job_payload)
+            
+            # Verify data fetcher was initialized
+            mock_data_fetcher_class.assert_called_once()
+            
+            # Verify run status was updated to IN_PROGRESS
+            mock_update_status.assert_any_call(
+                mock_data_fetcher,
+                "run_789",
+                RUN_STATUS_IN_PROGRESS,
+                "project_456",
+                False,  # is_scheduled
+                False   # is_initial_run
+            )
+            
+            # Verify crawl was called with data fetcher
+            mock_crawl.assert_called_once()
+            call_args = mock_crawl.call_args
+            assert call_args[0][0] == "https://example.com"  # start_url
+            assert call_args[0][1] == "project_456"  # project_id
+            assert call_args[0][2] == "run_789"  # run_id
+            assert call_args[0][3] == mock_data_fetcher  # data_fetcher
+            
+            # Verify LLMS text generation
+            mock_generate.assert_called_once_with(sample_crawl_result, "job_123")
+            
+            # Verify S3 upload
+            mock_upload.assert_called_once()
+            upload_args = mock_upload.call_args
+            assert upload_args[0][0] == mock_data_fetcher  # data_fetcher
+            assert upload_args[0][1] == "# Test Content\n\nTest llms.txt content"  # content
+            assert upload_args[0][2] == "llms_job_123.txt"  # filename
+            assert upload_args[0][3] == "run_789"  # run_id
+            assert upload_args[0][4] == "project_456"  # project_id
+            assert upload_args[0][5] is True  # changes_detected
+            
+            # Verify result
+            assert result["s3_url_txt"] == "https://example.com/llms_123.txt"
+            assert result["pages_crawled"] == 2
+            assert result["changes_detected"] is True
+
+    def test_process_job_payload_no_changes(self, sample_job_payload):
+        """Test job processing when no changes are detected."""
+        crawl_result_no_changes = {
+            "start_url": "https://example.com",
+            "pages_crawled": 0,
+            "max_pages": 100,
+            "max_depth": 2,
+            "pages": [],
+            "changes_detected": False,
+            "changed_pages": [],
+            "new_pages": [],
+            "unchanged_pages": [{"id": "page_123", "url": "https://example.com"}]
+        }
+        
+        with patch.object(pipeline, 'DataFetcher') as mock_data_fetcher_class, \
+             patch.object(pipeline, 'crawl_with_change_detection') as mock_crawl, \
+             patch.object(pipeline, 'generate_llms_text') as mock_generate, \
+             patch.object(pipeline, 'maybe_upload_s3_from_memory') as mock_upload, \
+             patch.object(pipeline, 'update_run_status') as mock_update_status:
+            
+            # Setup mocks
+            mock_data_fetcher = Mock()
+            mock_data_fetcher_class.return_value = mock_data_fetcher
+            
+            mock_crawl.return_value = crawl_result_no_changes
+            mock_update_status.return_value = True
+            
+            result = process_job_payload(sample_job_payload)
+            
+            # Verify run status was updated to IN_PROGRESS first
+            mock_update_status.assert_any_call(
+                mock_data_fetcher,
+                "run_789",
+                RUN_STATUS_IN_PROGRESS,
+                "project_456",
+                False,  # is_scheduled
+                False   # is_initial_run
+            )
+            
+            # Verify run status was updated to COMPLETE_NO_DIFFS
+            mock_update_status.assert_any_call(
+                mock_data_fetcher,
+                "run_789",
+                RUN_STATUS_COMPLETE_NO_DIFFS,
+                "project_456",
+                False,  # is_scheduled
+                False,  # is_initial_run
+                "No changes detected, skipping generation"  # summary
+            )
+            
+            # Verify LLMS generation and S3 upload were skipped
+            mock_generate.assert_not_called()
+            mock_upload.assert_not_called()
+            
+            # Verify result
+            assert result["s3_url_txt"] is None
+            assert result["pages_crawled"] == 0
+            assert result["changes_detected"] is False
+            assert result["message"] == "No changes detected"
+
+    def test_process_job_payload_scheduled_run(self, sample_job_payload, sample_crawl_result):
+        """Test job processing for scheduled run."""
+        scheduled_job = sample_job_payload.copy()
+        scheduled_job["isScheduled"] = True
+        
+        with patch.object(pipeline, 'DataFetcher') as mock_data_fetcher_class, \
+             patch.object(pipeline, 'crawl_with_change_detection') as mock_crawl, \
+             patch.object(pipeline, 'generate_llms_text') as mock_generate, \
+             patch.object(pipeline, 'maybe_upload_s3_from_memory') as mock_upload, \
+             patch.object(pipeline, 'update_run_status') as mock_update_status:
+            
+            # Setup mocks
+            mock_data_fetcher = Mock()
+            mock_data_fetcher_class.return_value = mock_data_fetcher
+            
+            mock_crawl.return_value = sample_crawl_result
+            mock_generate.return_value = "# Test Content"
+            mock_upload.return_value = "https://example.com/llms_123.txt"
+            mock_update_status.return_value = True
+            
+            result = process_job_payload(scheduled_job)
+            
+            # Verify run status was updated with is_scheduled=True
+            mock_update_status.assert_any_call(
+                mock_data_fetcher,
+                "run_789",
+                RUN_STATUS_IN_PROGRESS,
+                "project_456",
+                True,   # is_scheduled
+                False   # is_initial_run
+            )
+
+    def test_process_job_payload_initial_run(self, sample_job_payload, sample_crawl_result):
+        """Test job processing for initial run."""
+        initial_job = sample_job_payload.copy()
+        initial_job["isInitialRun"] = True
+        
+        with patch.object(pipeline, 'DataFetcher') as mock_data_fetcher_class, \
+             patch.object(pipeline, 'crawl_with_change_detection') as mock_crawl, \
+             patch.object(pipeline, 'generate_llms_text') as mock_generate, \
+             patch.object(pipeline, 'maybe_upload_s3_from_memory') as mock_upload, \
+             patch.object(pipeline, 'update_run_status') as mock_update_status:
+            
+            # Setup mocks
+            mock_data_fetcher = Mock()
+            mock_data_fetcher_class.return_value = mock_data_fetcher
+            
+            mock_crawl.return_value = sample_crawl_result
+            mock_generate.return_value = "# Test Content"
+            mock_upload.return_value = "https://example.com/llms_123.txt"
+            mock_update_status.return_value = True
+            
+            result = process_job_payload(initial_job)
+            
+            # Verify run status was updated with is_initial_run=True
+            mock_update_status.assert_any_call(
+                mock_data_fetcher,
+                "run_789",
+                RUN_STATUS_IN_PROGRESS,
+                "project_456",
+                False,  # is_scheduled
+                True    # is_initial_run
+            )
+
+    def test_process_job_payload_missing_required_fields(self):
+        """Test job processing with missing required fields."""
+        incomplete_job = {
+            "id": "job_123",
+            "url": "https://example.com"
+            # Missing projectId and runId
+        }
+        
+        with pytest.raises(ValueError, match="job must contain id\\+url\\+project id\\+run id"):
+            process_job_payload(incomplete_job)
+
+    def test_process_job_payload_missing_id(self):
+        """Test job processing with missing job ID."""
+        incomplete_job = {
+            "url": "https://example.com",
+            "projectId": "project_456",
+            "runId": "run_789"
+            # Missing id
+        }
+        
+        with pytest.raises(ValueError, match="job must contain id\\+url\\+project id\\+run id"):
+            process_job_payload(incomplete_job)
+
+    def test_process_job_payload_missing_url(self):
+        """Test job processing with missing URL."""
+        incomplete_job = {
+            "id": "job_123",
+            "projectId": "project_456",
+            "runId": "run_789"
+            # Missing url
+        }
+        
+        with pytest.raises(ValueError, match="job must contain id\\+url\\+project id\\+run id"):
+            process_job_payload(incomplete_job)
+
+    def test_process_job_payload_crawl_error(self, sample_job_payload):
+        """Test job processing when crawl fails."""
+        with patch.object(pipeline, 'DataFetcher') as mock_data_fetcher_class, \
+             patch.object(pipeline, 'crawl_with_change_detection') as mock_crawl, \
+             patch.object(pipeline, 'update_run_status') as mock_update_status:
+            
+            # Setup mocks
+            mock_data_fetcher = Mock()
+            mock_data_fetcher_class.return_value = mock_data_fetcher
+            
+            mock_crawl.side_effect = Exception("Crawl failed")
+            mock_update_status.return_value = True
+            
+            with pytest.raises(Exception, match="Crawl failed"):
+                process_job_payload(sample_job_payload)
+            
+            # Verify run status was updated to IN_PROGRESS before failure
+            mock_update_status.assert_called_with(
+                mock_data_fetcher,
+                "run_789",
+                RUN_STATUS_IN_PROGRESS,
+                "project_456",
+                False,  # is_scheduled
+                False   # is_initial_run
+            )
+
+    def test_process_job_payload_generation_error(self, sample_job_payload, sample_crawl_result):
+        """Test job processing when LLMS generation fails."""
+        with patch.object(pipeline, 'DataFetcher') as mock_data_fetcher_class, \
+             patch.object(pipeline, 'crawl_with_change_detection') as mock_crawl, \
+             patch.object(pipeline, 'generate_llms_text') as mock_generate, \
+             patch.object(pipeline, 'update_run_status') as mock_update_status:
+            
+            # Setup mocks
+            mock_data_fetcher = Mock()
+            mock_data_fetcher_class.return_value = mock_data_fetcher
+            
+            mock_crawl.return_value = sample_crawl_result
+            mock_generate.side_effect = Exception("Generation failed")
+            mock_update_status.return_value = True
+            
+            with pytest.raises(Exception, match="Generation failed"):
+                process_job_payload(sample_job_payload)
+
+    def test_process_job_payload_upload_error(self, sample_job_payload, sample_crawl_result):
+        """Test job processing when S3 upload fails."""
+        with patch.object(pipeline, 'DataFetcher') as mock_data_fetcher_class, \
+             patch.object(pipeline, 'crawl_with_change_detection') as mock_crawl, \
+             patch.object(pipeline, 'generate_llms_text') as mock_generate, \
+             patch.object(pipeline, 'maybe_upload_s3_from_memory') as mock_upload, \
+             patch.object(pipeline, 'update_run_status') as mock_update_status:
+            
+            # Setup mocks
+            mock_data_fetcher = Mock()
+            mock_data_fetcher_class.return_value = mock_data_fetcher
+            
+            mock_crawl.return_value = sample_crawl_result
+            mock_generate.return_value = "# Test Content"
+            mock_upload.side_effect = Exception("Upload failed")
+            mock_update_status.return_value = True
+            
+            with pytest.raises(Exception, match="Upload failed"):
+                process_job_payload(sample_job_payload)
+
+    def test_process_job_payload_uses_crawl_opts(self, sample_job_payload, sample_crawl_result):
+        """Test job processing passes the startup crawl options to the crawler."""
+        with patch.object(pipeline, 'DataFetcher') as mock_data_fetcher_class, \
+             patch.object(pipeline, 'crawl_with_change_detection') as mock_crawl, \
+             patch.object(pipeline, 'generate_llms_text') as mock_generate, \
+             patch.object(pipeline, 'maybe_upload_s3_from_memory') as mock_upload, \
+             patch.object(pipeline, 'update_run_status') as mock_update_status, \
+             patch.object(pipeline, 'CRAWL_OPTS', {"max_pages": 50, "max_depth": 3, "delay": 1.0}):
+            
+            # Setup mocks
+            mock_data_fetcher = Mock()
+            mock_data_fetcher_class.return_value = mock_data_fetcher
+            
+            mock_crawl.return_value = sample_crawl_result
+            mock_generate.return_value = "# Test Content"
+            mock_upload.return_value = "https://example.com/llms_123.txt"
+            mock_update_status.return_value = True
+            
+            result = process_job_payload(sample_job_payload)
+            
+            # Verify crawl was called with the configured options
+            mock_crawl.assert_called_once()
+            call_kwargs = mock_crawl.call_args[1]
+            assert call_kwargs["max_pages"] == 50
+            assert call_kwargs["max_depth"] == 3
+            assert call_kwargs["delay"] == 1.0
+
+    def test_load_crawl_opts_environment_variables(self):
+        """Test crawl options with custom environment variables."""
+        with patch.dict('os.environ', {
+            'CRAWL_MAX_PAGES': '50',
+            'CRAWL_MAX_DEPTH': '3',
+            'CRAWL_DELAY': '1.0'
+        }):
+            opts = pipeline.load_crawl_opts()
+        
+        assert opts == {"max_pages": 50, "max_depth": 3, "delay": 1.0}
+
+    def test_load_crawl_opts_default_environment_variables(self):
+        """Test crawl options with default environment variables."""
+        with patch.dict('os.environ', {}, clear=True):  # Clear environment variables
+            opts = pipeline.load_crawl_opts()
+        
+        assert opts["max_pages"] == 100  # Default from constants
+        assert opts["max_depth"] == 2    # Default from constants
+        assert opts["delay"] == 0.5      # Default from constants
+
+    def test_run_job_success(self, sample_job_payload):
+        """Test run_job processes the job without handing the result back to the pool."""
+        with patch.object(pipeline, 'process_job_payload') as mock_process, \
+             patch.object(pipeline, 'update_run_status') as mock_update_status:
+            mock_process.return_value = {"pages_crawled": 2, "changes_detected": True}
+            
+            result = pipeline.run_job(sample_job_payload)
+            
+            assert result is None
+            mock_process.assert_called_once_with(sample_job_payload)
+            mock_update_status.assert_not_called()
+
+    def test_run_job_marks_run_failed(self, sample_job_payload):
+        """Test run_job records a failed run instead of raising."""
+        with patch.object(pipeline, 'DataFetcher') as mock_data_fetcher_class, \
+             patch.object(pipeline, 'process_job_payload') as mock_process, \
+             patch.object(pipeline, 'update_run_status') as mock_update_status, \
+             patch.object(pipeline, 'schedule_next_run') as mock_schedule:
+            mock_data_fetcher = Mock()
+            mock_data_fetcher_class.return_value = mock_data_fetcher
+            mock_process.side_effect = Exception("Crawl failed")
+            
+            result = pipeline.run_job(sample_job_payload)
+            
+            assert result is None
+            mock_update_status.assert_called_once_with(
+                mock_data_fetcher,
+                "run_789",
+                RUN_STATUS_FAILED,
+                "project_456",
+                False,  # is_scheduled
+                False,  # is_initial_run
+                "Crawl failed"
+            )
+            mock_schedule.assert_not_called()
+
+    def test_mark_run_failed_reschedules_scheduled_run(self, sample_job_payload):
+        """Test a failed scheduled run still schedules the project's next run."""
+        sample_job_payload["isScheduled"] = True
+        with patch.object(pipeline, 'DataFetcher'), \
+             patch.object(pipeline, 'update_run_status') as mock_update_status, \
+             patch.object(pipeline, 'schedule_next_run') as mock_schedule:
+            pipeline.mark_run_failed(sample_job_payload, Exception("Crawl failed"))
+            
+            assert mock_update_status.call_args[0][2] == RUN_STATUS_FAILED
+            mock_schedule.assert_called_once_with("project_456")
@@ -318,6 +318,28 @@ class TestStorageBusinessLogic:
             assert result is True
             mock_webhooks.assert_not_called()  # No webhooks for scheduled run without diffs
 
+    def test_update_run_status_scheduled_run_no_diffs_skips_artifact_lookup(self, mock_data_fetcher):
+        """Test scheduled run without diffs doesn't query the latest artifact."""
+        mock_data_fetcher.update_run_status.return_value = True
+        mock_data_fetcher.update_project_last_run.return_value = True
+        
+        with patch('worker.storage.schedule_next_run') as mock_schedule, \
+             patch('worker.storage.call_webhooks_for_project') as mock_webhooks:
+            
+            result = update_run_status(
+                data_fetcher=mock_data_fetcher,
+                run_id="run_123",
+                status=RUN_STATUS_COMPLETE_NO_DIFFS,
+                project_id="project_123",
+                is_scheduled=True,
+                is_initial_run=False,
+                summary="No changes detected, skipping generation"
+            )
+            
+            assert result is True
+            mock_data_fetcher.get_latest_llms_txt_url.assert_not_called()
+            mock_webhooks.assert_not_called()
+
     def test_update_run_status_no_project_id(self, mock_data_fetcher):
         """Test run status update without project_id."""
         mock_data_fetcher.update_run_status.return_value = True
@@ -1,8 +1,11 @@
-"""Unit tests for main worker process business logic."""
+"""Unit tests for the Cloud Tasks HTTP worker."""
 
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 import json
+import socket
+import threading
+from concurrent.futures import Future
 
 import sys
 import os
@@ -11,363 +14,95 @@ import importlib.util
 spec = importlib.util.spec_from_file_location("worker_module", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "worker.py"))
 worker_module = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(worker_module)
-process_job_payload = worker_module.process_job_payload
 CloudTasksHandler = worker_module.CloudTasksHandler
-from worker.constants import (
-    RUN_STATUS_IN_PROGRESS,
-    RUN_STATUS_COMPLETE_NO_DIFFS,
-    RUN_STATUS_COMPLETE_WITH_DIFFS
-)
+import worker.pipeline as pipeline
 
 
-class TestWorkerMainProcess:
-    """Test cases for main worker process business logic."""
-
-    def test_process_job_payload_success(self, sample_job_payload, sample_crawl_result):
-        """Test successful job processing."""
-        with patch.object(worker_module, 'DataFetcher') as mock_data_fetcher_class, \
-             patch.object(worker_module, 'crawl_with_change_detection') as mock_crawl, \
-             patch.object(worker_module, 'generate_llms_text') as mock_generate, \
-             patch.object(worker_module, 'maybe_upload_s3_from_memory') as mock_upload, \
-             patch.object(worker_module, 'update_run_status') as mock_update_status:
-            
-            # Setup mocks
-            mock_data_fetcher = Mock()
-            mock_data_fetcher_class.return_value = mock_data_fetcher
-            
-            mock_crawl.return_value = sample_crawl_result
-            mock_generate.return_value = "# Test Content\n\nTest llms.txt content"
-            mock_upload.return_value = "https://example.com/llms_123.txt"
-            mock_update_status.return_value = True
-            
-            result = process_job_payload(sample_job_payload)
-            
-            # Verify data fetcher was initialized
-            mock_data_fetcher_class.assert_called_once()
-            
-            # Verify run status was updated to IN_PROGRESS
-            mock_update_status.assert_any_call(
-                mock_data_fetcher,
-                "run_789",
-                RUN_STATUS_IN_PROGRESS,
-                "project_456",
-                False,  # is_scheduled
-                False   # is_initial_run
-            )
-            
-            # Verify crawl was called with data fetcher
-            mock_crawl.assert_called_once()
-            call_args = mock_crawl.call_args
-            assert call_args[0][0] == "https://example.com"  # start_url
-            assert call_args[0][1] == "project_456"  # project_id
-            assert call_args[0][2] == "run_789"  # run_id
-            assert call_args[0][3] == mock_data_fetcher  # data_fetcher
-            
-            # Verify LLMS text generation
-            mock_generate.assert_called_once_with(sample_crawl_result, "job_123")
-            
-            # Verify S3 upload
-            mock_upload.assert_called_once()
-            upload_args = mock_upload.call_args
-            assert upload_args[0][0] == mock_data_fetcher  # data_fetcher
-            assert upload_args[0][1] == "# Test Content\n\nTest llms.txt content"  # content
-            assert upload_args[0][2] == "llms_job_123.txt"  # filename
-            assert upload_args[0][3] == "run_789"  # run_id
-            assert upload_args[0][4] == "project_456"  # project_id
-            assert upload_args[0][5] is True  # changes_detected
-            
-            # Verify result
-            assert result["s3_url_txt"] == "https://example.com/llms_123.txt"
-            assert result["pages_crawled"] == 2
-            assert result["changes_detected"] is True
-
-    def test_process_job_payload_no_changes(self, sample_job_payload):
-        """Test job processing when no changes are detected."""
-        crawl_result_no_changes = {
-            "start_url": "https://example.com",
-            "pages_crawled": 0,
-            "max_pages": 100,
-            "max_depth": 2,
-            "pages": [],
-            "changes_detected": False,
-            "changed_pages": [],
-            "new_pages": [],
-            "unchanged_pages": [{"id": "page_123", "url": "https://example.com"}]
-        }
-        
-        with patch.object(worker_module, 'DataFetcher') as mock_data_fetcher_class, \
-             patch.object(worker_module, 'crawl_with_change_detection') as mock_crawl, \
-             patch.object(worker_module, 'generate_llms_text') as mock_generate, \
-             patch.object(worker_module, 'maybe_upload_s3_from_memory') as mock_upload, \
-             patch.object(worker_module, 'update_run_status') as mock_update_status:
-            
-            # Setup mocks
-            mock_data_fetcher = Mock()
-            mock_data_fetcher_class.return_value = mock_data_fetcher
-            
-            mock_crawl.return_value = crawl_result_no_changes
-            mock_update_status.return_value = True
-            
-            result = process_job_payload(sample_job_payload)
-            
-            # Verify run status was updated to IN_PROGRESS first
-            mock_update_status.assert_any_call(
-                mock_data_fetcher,
-                "run_789",
-                RUN_STATUS_IN_PROGRESS,
-                "project_456",
-                False,  # is_scheduled
-                False   # is_initial_run
-            )
-            
-            # Verify run status was updated to COMPLETE_NO_DIFFS
-            mock_update_status.assert_any_call(
-                mock_data_fetcher,
-                "run_789",
-                RUN_STATUS_COMPLETE_NO_DIFFS,
-                "project_456",
-                False,  # is_scheduled
-                False,  # is_initial_run
-                "No changes detected, skipping generation"  # summary
-            )
-            
-            # Verify LLMS generation and S3 upload were skipped
-            mock_generate.assert_not_called()
-            mock_upload.assert_not_called()
-            
-            # Verify result
-            assert result["s3_url_txt"] is None
-            assert result["pages_crawled"] == 0
-            assert result["changes_detected"] is False
-            assert result["message"] == "No changes detected"
+class TestCloudTasksHandler:
+    """Test cases for CloudTasksHandler."""
 
-    def test_process_job_payload_scheduled_run(self, sample_job_payload, sample_crawl_result):
-        """Test job processing for scheduled run."""
-        scheduled_job = sample_job_payload.copy()
-        scheduled_job["isScheduled"] = True
+    def test_do_post_success(self):
+        """Test POST request is acknowledged and handed off to the executor."""
+        # Create a proper mock request object
+        mock_request = Mock()
+        mock_request.makefile.return_value = Mock()
         
-        with patch.object(worker_module, 'DataFetcher') as mock_data_fetcher_class, \
-             patch.object(worker_module, 'crawl_with_change_detection') as mock_crawl, \
-             patch.object(worker_module, 'generate_llms_text') as mock_generate, \
-             patch.object(worker_module, 'maybe_upload_s3_from_memory') as mock_upload, \
-             patch.object(worker_module, 'update_run_status') as mock_update_status:
-            
-            # Setup mocks
-            mock_data_fetcher = Mock()
-            mock_data_fetcher_class.return_value = mock_data_fetcher
-            
-            mock_crawl.return_value = sample_crawl_result
-            mock_generate.return_value = "# Test Content"
-            mock_upload.return_value = "https://example.com/llms_123.txt"
-            mock_update_status.return_value = True
-            
-            result = process_job_payload(scheduled_job)
-            
-            # Verify run status was updated with is_scheduled=True
-            mock_update_status.assert_any_call(
-                mock_data_fetcher,
-                "run_789",
-                RUN_STATUS_IN_PROGRESS,
-                "project_456",
-                True,   # is_scheduled
-                False   # is_initial_run
-            )
-
-    def test_process_job_payload_initial_run(self, sample_job_payload, sample_crawl_result):
-        """Test job processing for initial run."""
-        initial_job = sample_job_payload.copy()
-        initial_job["isInitialRun"] = True
+        with patch.object(CloudTasksHandler, 'handle'):
+            handler = CloudTasksHandler(mock_request, ("127.0.0.1", 8080), None)
         
-        with patch.object(worker_module, 'DataFetcher') as mock_data_fetcher_class, \
-             patch.object(worker_module, 'crawl_with_change_detection') as mock_crawl, \
-             patch.object(worker_module, 'generate_llms_text') as mock_generate, \
-             patch.object(worker_module, 'maybe_upload_s3_from_memory') as mock_upload, \
-             patch.object(worker_module, 'update_run_status') as mock_update_status:
-            
-            # Setup mocks
-            mock_data_fetcher = Mock()
-            mock_data_fetcher_class.return_value = mock_data_fetcher
-            
-            mock_crawl.return_value = sample_crawl_result
-            mock_generate.return_value = "# Test Content"
-            mock_upload.return_value = "https://example.com/llms_123.txt"
-            mock_update_status.return_value = True
-            
-            result = process_job_payload(initial_job)
-            
-            # Verify run status was updated with is_initial_run=True
-            mock_update_status.assert_any_call(
-                mock_data_fetcher,
-                "run_789",
-                RUN_STATUS_IN_PROGRESS,
-                "project_456",
-                False,  # is_scheduled
-                True    # is_initial_run
-            )
-
-    def test_process_job_payload_missing_required_fields(self):
-        """Test job processing with missing required fields."""
-        incomplete_job = {
+        # Mock request data
+        job_data = {
             "id": "job_123",
-            "url": "https://example.com"
-            # Missing projectId and runId
-        }
-        
-        with pytest.raises(ValueError, match="job must contain id\\+url\\+project id\\+run id"):
-            process_job_payload(incomplete_job)
-
-    def test_process_job_payload_missing_id(self):
-        """Test job processing with missing job ID."""
-        incomplete_job = {
             "url": "https://example.com",
             "projectId": "project_456",
             "runId": "run_789"
-            # Missing id
         }
         
-        with pytest.raises(ValueError, match="job must contain id\\+url\\+project id\\+run id"):
-            process_job_payload(incomplete_job)
-
-    def test_process_job_payload_missing_url(self):
-        """Test job processing with missing URL."""
-        incomplete_job = {
-            "id": "job_123",
-            "projectId": "project_456",
-            "runId": "run_789"
-            # Missing url
-        }
-        
-        with pytest.raises(ValueError, match="job must contain id\\+url\\+project id\\+run id"):
-            process_job_payload(incomplete_job)
-
-    def test_process_job_payload_crawl_error(self, sample_job_payload):
-        """Test job processing when crawl fails."""
-        with patch.object(worker_module, 'DataFetcher') as mock_data_fetcher_class, \
-             patch.object(worker_module, 'crawl_with_change_detection') as mock_crawl, \
-             patch.object(worker_module, 'update_run_status') as mock_update_status:
-            
-            # Setup mocks
-            mock_data_fetcher = Mock()
-            mock_data_fetcher_class.return_value = mock_data_fetcher
-            
-            mock_crawl.side_effect = Exception("Crawl failed")
-            mock_update_status.return_value = True
-            
-            with pytest.raises(Exception, match="Crawl failed"):
-                process_job_payload(sample_job_payload)
-            
-            # Verify run status was updated to IN_PROGRESS before failure
-            mock_update_status.assert_called_with(
-                mock_data_fetcher,
-                "run_789",
-                RUN_STATUS_IN_PROGRESS,
-                "project_456",
-                False,  # is_scheduled
-                False   # is_initial_run
-            )
-
-    def test_process_job_payload_generation_error(self, sample_job_payload, sample_crawl_result):
-        """Test job processing when LLMS generation fails."""
-        with patch.object(worker_module, 'DataFetcher') as mock_data_fetcher_class, \
-             patch.object(worker_module, 'crawl_with_change_detection') as mock_crawl, \
-             patch.object(worker_module, 'generate_llms_text') as mock_generate, \
-             patch.object(worker_module, 'update_run_status') as mock_update_status:
-            
-            # Setup mocks
-            mock_data_fetcher = Mock()
-            mock_data_fetcher_class.return_value = mock_data_fetcher
-            
-            mock_crawl.return_value = sample_crawl_result
-            mock_generate.side_effect = Exception("Generation failed")
-            mock_update_status.return_value = True
-            
-            with pytest.raises(Exception, match="Generation failed"):
-                process_job_payload(sample_job_payload)
-
-    def test_process_job_payload_upload_error(self, sample_job_payload, sample_crawl_result):
-        """Test job processing when S3 upload fails."""
-        with patch.object(worker_module, 'DataFetcher') as mock_data_fetcher_class, \
-             patch.object(worker_module, 'crawl_with_change_detection') as mock_crawl, \
-             patch.object(worker_module, 'generate_llms_text') as mock_generate, \
-             patch.object(worker_module, 'maybe_upload_s3_from_memory') as mock_upload, \
-             patch.object(worker_module, 'update_run_status') as mock_update_status:
-            
-            # Setup mocks
-            mock_data_fetcher = Mock()
-            mock_data_fetcher_class.return_value = mock_data_fetcher
+        with patch.object(handler, 'rfile') as mock_rfile, \
+             patch.object(handler, 'wfile') as mock_wfile, \
+             patch.object(handler, 'send_response') as mock_send_response, \
+             patch.object(handler, 'send_header') as mock_send_header, \
+             patch.object(handler, 'end_headers') as mock_end_headers, \
+             patch.object(worker_module, 'EXECUTOR') as mock_executor, \
+             patch.object(worker_module, '_JOB_SLOTS') as mock_slots:
             
-            mock_crawl.return_value = sample_crawl_result
-            mock_generate.return_value = "# Test Content"
-            mock_upload.side_effect = Exception("Upload failed")
-            mock_update_status.return_value = True
+            # Setup request
+            handler.headers = {'Content-Length': str(len(json.dumps(job_data).encode('utf-8')))}
+            mock_rfile.read.return_value = json.dumps(job_data).encode('utf-8')
             
-            with pytest.raises(Exception, match="Upload failed"):
-                process_job_payload(sample_job_payload)
-
-    def test_process_job_payload_environment_variables(self, sample_job_payload, sample_crawl_result):
-        """Test job processing with custom environment variables."""
-        with patch.object(worker_module, 'DataFetcher') as mock_data_fetcher_class, \
-             patch.object(worker_module, 'crawl_with_change_detection') as mock_crawl, \
-             patch.object(worker_module, 'generate_llms_text') as mock_generate, \
-             patch.object(worker_module, 'maybe_upload_s3_from_memory') as mock_upload, \
-             patch.object(worker_module, 'update_run_status') as mock_update_status, \
-             patch.dict('os.environ', {
-                 'CRAWL_MAX_PAGES': '50',
-                 'CRAWL_MAX_DEPTH': '3',
-                 'CRAWL_DELAY': '1.0'
-             }):
+            handler.do_POST()
             
-            # Setup mocks
-            mock_data_fetcher = Mock()
-            mock_data_fetcher_class.return_value = mock_data_fetcher
+            # Verify a job slot is held until the job completes
+            mock_slots.acquire.assert_called_once_with(blocking=False)
+            mock_slots.release.assert_not_called()
+            mock_executor.submit.return_value.add_done_callback.assert_called_once()
+            done_callback = mock_executor.submit.return_value.add_done_callback.call_args[0][0]
+            assert done_callback.func is worker_module._job_done
+            assert done_callback.args == (job_data,)
+            assert worker_module._PENDING_JOBS.pop(mock_executor.submit.return_value) == job_data
             
-            mock_crawl.return_value = sample_crawl_result
-            mock_generate.return_value = "# Test Content"
-            mock_upload.return_value = "https://example.com/llms_123.txt"
-            mock_update_status.return_value = True
+            # Verify response
+            mock_send_response.assert_called_with(200)
+            mock_send_header.assert_called_with('Content-Type', 'application/json')
+            mock_end_headers.assert_called_once()
             
-            result = process_job_payload(sample_job_payload)
+            # Verify the job was submitted to the executor
+            mock_executor.submit.assert_called_once_with(pipeline.run_job, job_data)
             
-            # Verify crawl was called with custom options
-            mock_crawl.assert_called_once()
-            call_kwargs = mock_crawl.call_args[1]
-            assert call_kwargs["max_pages"] == 50
-            assert call_kwargs["max_depth"] == 3
-            assert call_kwargs["delay"] == 1.0
+            # Verify the acknowledgement body was written and flushed
+            mock_wfile.write.assert_called_once()
+            written_data = mock_wfile.write.call_args[0][0]
+            assert json.loads(written_data.decode('utf-8')) == {"accepted": "job_123"}
+            mock_wfile.flush.assert_called_once()
 
-    def test_process_job_payload_default_environment_variables(self, sample_job_payload, sample_crawl_result):
-        """Test job processing with default environment variables."""
-        with patch.object(worker_module, 'DataFetcher') as mock_data_fetcher_class, \
-             patch.object(worker_module, 'crawl_with_change_detection') as mock_crawl, \
-             patch.object(worker_module, 'generate_llms_text') as mock_generate, \
-             patch.object(worker_module, 'maybe_upload_s3_from_memory') as mock_upload, \
-             patch.object(worker_module, 'update_run_status') as mock_update_status, \
-             patch.dict('os.environ', {}, clear=True):  # Clear environment variables
-            
-            # Setup mocks
-            mock_data_fetcher = Mock()
-            mock_data_fetcher_class.return_value = mock_data_fetcher
+    def test_do_post_invalid_job(self):
+        """Test POST request with a job missing required fields is rejected."""
+        # Create a proper mock request object
+        mock_request = Mock()
+        mock_request.makefile.return_value = Mock()
+        
+        with patch.object(CloudTasksHandler, 'handle'):
+            handler = CloudTasksHandler(mock_request, ("127.0.0.1", 8080), None)
+        
+        job_data = {"id": "job_123", "url": "https://example.com"}
+        
+        with patch.object(handler, 'rfile') as mock_rfile, \
+             patch.object(handler, 'wfile') as mock_wfile, \
+             patch.object(handler, 'send_response') as mock_send_response, \
+             patch.object(handler, 'send_header'), \
+             patch.object(handler, 'end_headers'), \
+             patch.object(worker_module, 'EXECUTOR') as mock_executor:
             
-            mock_crawl.return_value = sample_crawl_result
-            mock_generate.return_value = "# Test Content"
-            mock_upload.return_value = "https://example.com/llms_123.txt"
-            mock_update_status.return_value = True
+            handler.headers = {'Content-Length': str(len(json.dumps(job_data).encode('utf-8')))}
+            mock_rfile.read.return_value = json.dumps(job_data).encode('utf-8')
             
-            result = process_job_payload(sample_job_payload)
+            handler.do_POST()
             
-            # Verify crawl was called with default options
-            mock_crawl.assert_called_once()
-            call_kwargs = mock_crawl.call_args[1]
-            assert call_kwargs["max_pages"] == 100  # Default from constants
-            assert call_kwargs["max_depth"] == 2    # Default from constants
-            assert call_kwargs["delay"] == 0.5      # Default from constants
-
-
-class TestCloudTasksHandler:
-    """Test cases for CloudTasksHandler."""
+            mock_send_response.assert_called_with(500)
+            mock_executor.submit.assert_not_called()
 
-    def test_do_post_success(self):
-        """Test successful POST request handling."""
+    def test_do_post_at_capacity(self):
+        """Test POST request is rejected with 429 when every job slot is busy."""
         # Create a proper mock request object
         mock_request = Mock()
         mock_request.makefile.return_value = Mock()
@@ -375,7 +110,6 @@ class TestCloudTasksHandler:
         with patch.object(CloudTasksHandler, 'handle'):
             handler = CloudTasksHandler(mock_request, ("127.0.0.1", 8080), None)
         
-        # Mock request data
         job_data = {
             "id": "job_123",
             "url": "https://example.com",
@@ -384,38 +118,25 @@ class TestCloudTasksHandler:
         }
         
         with patch.object(handler, 'rfile') as mock_rfile, \
-             patch.object(handler, 'wfile') as mock_wfile, \
+             patch.object(handler, 'wfile'), \
              patch.object(handler, 'send_response') as mock_send_response, \
-             patch.object(handler, 'send_header') as mock_send_header, \
-             patch.object(handler, 'end_headers') as mock_end_headers, \
-             patch.object(worker_module, 'process_job_payload') as mock_process:
+             patch.object(handler, 'send_header'), \
+             patch.object(handler, 'end_headers'), \
+             patch.object(worker_module, 'EXECUTOR') as mock_executor, \
+             patch.object(worker_module, '_JOB_SLOTS') as mock_slots:
             
-            # Setup request
             handler.headers = {'Content-Length': str(len(json.dumps(job_data).encode('utf-8')))}
             mock_rfile.read.return_value = json.dumps(job_data).encode('utf-8')
-            
-            # Mock process result
-            mock_process.return_value = {
-                "s3_url_txt": "https://example.com/llms_123.txt",
-                "pages_crawled": 2,
-                "changes_detected": True
-            }
+            mock_slots.acquire.return_value = False
             
             handler.do_POST()
             
-            # Verify response
-            mock_send_response.assert_called_with(200)
-            mock_send_header.assert_called_with('Content-Type', 'application/json')
-            mock_end_headers.assert_called_once()
-            
-            # Verify process_job_payload was called
-            mock_process.assert_called_once_with(job_data)
-            
-            # Verify response body was written
-            mock_wfile.write.assert_called_once()
+            mock_send_response.assert_called_once_with(429)
+            mock_executor.submit.assert_not_called()
+            mock_slots.release.assert_not_called()
 
     def test_do_post_error(self):
-        """Test POST request handling with error."""
+        """Test a job that can't be started after the ack is recorded as a failed run."""
         # Create a proper mock request object
         mock_request = Mock()
         mock_request.makefile.return_value = Mock()
@@ -434,30 +155,28 @@ class TestCloudTasksHandler:
         with patch.object(handler, 'rfile') as mock_rfile, \
              patch.object(handler, 'wfile') as mock_wfile, \
              patch.object(handler, 'send_response') as mock_send_response, \
-             patch.object(handler, 'send_header') as mock_send_header, \
-             patch.object(handler, 'end_headers') as mock_end_headers, \
-             patch.object(worker_module, 'process_job_payload') as mock_process:
+             patch.object(handler, 'send_header'), \
+             patch.object(handler, 'end_headers'), \
+             patch.object(worker_module, 'EXECUTOR') as mock_executor, \
+             patch.object(worker_module, '_JOB_SLOTS') as mock_slots, \
+             patch.object(pipeline, 'mark_run_failed') as mock_mark_failed:
             
             # Setup request
             handler.headers = {'Content-Length': str(len(json.dumps(job_data).encode('utf-8')))}
             mock_rfile.read.return_value = json.dumps(job_data).encode('utf-8')
             
-            # Mock process error
-            mock_process.side_effect = Exception("Processing failed")
+            # Mock submission error
+            error = Exception("Processing failed")
+            mock_executor.submit.side_effect = error
             
             handler.do_POST()
             
-            # Verify error response
-            mock_send_response.assert_called_with(500)
-            mock_send_header.assert_called_with('Content-Type', 'application/json')
-            mock_end_headers.assert_called_once()
+            # Verify the task was still acknowledged and the job slot was given back
+            mock_send_response.assert_called_once_with(200)
+            mock_slots.release.assert_called_once()
             
-            # Verify error response body was written
-            mock_wfile.write.assert_called_once()
-            written_data = mock_wfile.write.call_args[0][0]
-            error_response = json.loads(written_data.decode('utf-8'))
-            assert "error" in error_response
-            assert "Processing failed" in error_response["error"]
+            # Verify the run was marked as failed instead
+            mock_mark_failed.assert_called_once_with(job_data, error)
 
     def test_do_get_health_check(self):
         """Test GET request for health check."""
@@ -542,3 +261,104 @@ class TestCloudTasksHandler:
         # Should return None (suppressed)
         result = handler.log_message("test format", "arg1", "arg2")
         assert result is None
+
+    def test_handle_termination_raises_keyboard_interrupt(self):
+        """Test that SIGTERM is turned into a clean shutdown."""
+        with pytest.raises(KeyboardInterrupt):
+            worker_module.handle_termination(15, None)
+
+    def test_reuse_port_server_sets_so_reuseport(self):
+        """Test that the server socket can be shared between processes."""
+        if not hasattr(socket, "SO_REUSEPORT"):
+            pytest.skip("SO_REUSEPORT not supported on this platform")
+        server = worker_module.ReusePortHTTPServer(("127.0.0.1", 0), CloudTasksHandler)
+        try:
+            assert server.socket.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT) == 1
+        finally:
+            server.server_close()
+
+    def test_main_creates_executor_after_forking(self):
+        """Test each server process gets its own pool, created after the fork."""
+        calls = []
+        
+        with patch.dict(os.environ, {"WEB_CONCURRENCY": "2"}), \
+             patch.object(worker_module.socket, 'SO_REUSEPORT', 15, create=True), \
+             patch.object(worker_module, 'fork_server_processes', side_effect=lambda count: calls.append("fork") or []), \
+             patch.object(worker_module, '_create_executor', side_effect=lambda: calls.append("pool") or Mock()), \
+             patch.object(worker_module, 'ReusePortHTTPServer') as mock_server_class, \
+             patch.object(worker_module.signal, 'signal'), \
+             patch.object(worker_module.threading, 'Thread'), \
+             patch.object(worker_module, '_fail_unfinished_jobs'), \
+             patch.object(worker_module, 'EXECUTOR', None):
+            mock_server_class.return_value.serve_forever.side_effect = KeyboardInterrupt
+            
+            worker_module.main()
+        
+        assert calls == ["fork", "pool"]
+
+    def test_submit_job_replaces_broken_pool(self):
+        """Test a pool broken by a dead worker is replaced and the job resubmitted."""
+        broken = Mock()
+        broken.submit.side_effect = worker_module.BrokenProcessPool("worker died")
+        replacement = Mock()
+        
+        with patch.object(worker_module, 'EXECUTOR', broken), \
+             patch.object(worker_module, '_create_executor', return_value=replacement):
+            future = worker_module._submit_job(pipeline.run_job, {"id": "job_123"})
+            
+            assert worker_module.EXECUTOR is replacement
+        
+        broken.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+        replacement.submit.assert_called_once_with(pipeline.run_job, {"id": "job_123"})
+        assert future is replacement.submit.return_value
+
+    def test_job_done_marks_run_failed_when_pool_fails(self):
+        """Test a job the pool couldn't finish releases its slot and fails its run."""
+        job_data = {"id": "job_123", "runId": "run_789"}
+        future = Mock()
+        future.cancelled.return_value = False
+        error = worker_module.BrokenProcessPool("worker died")
+        future.exception.return_value = error
+        
+        with patch.object(worker_module, '_JOB_SLOTS') as mock_slots, \
+             patch.object(pipeline, 'mark_run_failed') as mock_mark_failed:
+            worker_module._job_done(job_data, future)
+            
+            future.exception.return_value = None
+            worker_module._job_done(job_data, future)
+        
+        assert mock_slots.release.call_count == 2
+        mock_mark_failed.assert_called_once_with(job_data, error)
+
+    def test_create_executor_uses_forkserver(self):
+        """Test pool workers don't fork from the multithreaded server process."""
+        executor = worker_module._create_executor()
+        try:
+            assert executor._mp_context.get_start_method() == "forkserver"
+        finally:
+            executor.shutdown()
+
+    def test_fail_unfinished_jobs_on_shutdown(self):
+        """Test shutdown kills workers still running after the grace period and fails only the abandoned runs."""
+        finished, running, queued = Future(), Future(), Future()
+        finished.set_result(None)
+        queued.cancel()
+        live_worker, exited_worker = Mock(), Mock()
+        live_worker.is_alive.return_value = True
+        exited_worker.is_alive.return_value = False
+        executor = Mock()
+        executor._processes = {1: live_worker, 2: exited_worker}
+        pending = {finished: {"id": "job_1"}, running: {"id": "job_2"}, queued: {"id": "job_3"}}
+        
+        with patch.dict(worker_module._PENDING_JOBS, pending, clear=True), \
+             patch.object(worker_module, '_SHUTTING_DOWN', threading.Event()), \
+             patch.object(worker_module, 'SHUTDOWN_GRACE_SECONDS', 0), \
+             patch.object(pipeline, 'mark_run_failed') as mock_mark_failed:
+            worker_module._fail_unfinished_jobs(executor)
+            assert worker_module._SHUTTING_DOWN.is_set()
+        
+        executor.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+        live_worker.terminate.assert_called_once()
+        exited_worker.terminate.assert_not_called()
+        failed = [c[0][0]["id"] for c in mock_mark_failed.call_args_list]
+        assert sorted(failed) == ["job_2", "job_3"]
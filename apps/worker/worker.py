@@ -1,30 +1,34 @@
 #!/usr/bin/env python3
 # apps/worker/cloud_tasks_worker.py
 import os
+import functools
+import importlib
+import multiprocessing
 import json
-import traceback
 import logging
-from http.server import BaseHTTPRequestHandler, HTTPServer
+import signal
+import socket
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from urllib.parse import urlparse, parse_qs
 import threading
+from typing import Dict, Optional
 
 from dotenv import load_dotenv
 
-# local worker modules
-from worker.crawler import crawl_with_change_detection
-from worker.llms_generator import generate_llms_text
-from worker.storage import maybe_upload_s3_from_memory, update_run_status
-from worker.data_fetcher import DataFetcher
+# Load .env (repo root or apps/worker) before the worker modules read their settings
+load_dotenv()
+
+# local worker modules (worker.pipeline is imported once the server is up, see main())
 from worker.constants import (
     DEFAULT_PORT,
     ENV_PORT,
-    ENV_CRAWL_MAX_PAGES,
-    ENV_CRAWL_MAX_DEPTH,
-    ENV_CRAWL_DELAY,
-    RUN_STATUS_IN_PROGRESS,
-    RUN_STATUS_COMPLETE_NO_DIFFS,
-    LLMS_TXT_FILENAME_PREFIX,
-    LLMS_TXT_FILENAME_SUFFIX
+    ENV_WORKER_CONCURRENCY,
+    ENV_WEB_CONCURRENCY,
+    DEFAULT_WORKER_CONCURRENCY,
+    DEFAULT_WEB_CONCURRENCY,
+    SHUTDOWN_GRACE_SECONDS
 )
 
 # Note: The worker now includes Google Cloud Tasks functionality:
@@ -33,11 +37,97 @@ from worker.constants import (
 # - All run status updates now automatically schedule next runs when completed
 # - Database operations are optimized to minimize calls and maximize reuse
 
-load_dotenv()  # loads .env from repo root or apps/worker
-
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("cloud_tasks_worker")
 
+WORKER_CONCURRENCY = int(os.environ.get(ENV_WORKER_CONCURRENCY, DEFAULT_WORKER_CONCURRENCY))
+
+# Jobs run in a process pool so the HTTP handler can acknowledge a Cloud Task
+# as soon as it is parsed instead of holding the connection for the whole crawl.
+# Created by main() in each server process after forking: a pool inherited across
+# fork would share its call/result queues between processes.
+EXECUTOR: Optional[ProcessPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+# One slot per pool worker, held until the job finishes, so we never accept more
+# jobs than we can run and don't overrun memory or database/S3 connection limits.
+_JOB_SLOTS = threading.BoundedSemaphore(WORKER_CONCURRENCY)
+
+# Acknowledged jobs that haven't finished yet, so shutdown can fail their runs
+_PENDING_JOBS: Dict[Future, dict] = {}
+_PENDING_LOCK = threading.Lock()
+
+# Set once shutdown takes over failing unfinished runs, so _job_done doesn't fail them twice
+_SHUTTING_DOWN = threading.Event()
+
+
+def _create_executor() -> ProcessPoolExecutor:
+    """
+    Start a job pool. Workers are started by a forkserver rather than forked from this
+    multithreaded server process; the forkserver preloads the pipeline so each worker
+    starts with it already imported.
+    """
+    mp_context = multiprocessing.get_context("forkserver")
+    mp_context.set_forkserver_preload(["worker.pipeline"])
+    return ProcessPoolExecutor(max_workers=WORKER_CONCURRENCY, mp_context=mp_context)
+
+
+def _submit_job(fn, job_data: dict) -> Future:
+    """Submit a job to the pool, replacing the pool first if a dead worker has broken it."""
+    global EXECUTOR
+    executor = EXECUTOR
+    try:
+        return executor.submit(fn, job_data)
+    except BrokenProcessPool:
+        with _EXECUTOR_LOCK:
+            # Another request may have replaced it already
+            if EXECUTOR is executor:
+                logger.warning("Job pool is broken (a worker died), starting a new one")
+                executor.shutdown(wait=False, cancel_futures=True)
+                EXECUTOR = _create_executor()
+            executor = EXECUTOR
+        return executor.submit(fn, job_data)
+
+
+def _job_done(job_data: dict, future: Future) -> None:
+    """Release the job's slot; record the run as failed if the pool couldn't run it (e.g. its worker died)."""
+    with _PENDING_LOCK:
+        _PENDING_JOBS.pop(future, None)
+    _JOB_SLOTS.release()
+    if future.cancelled() or _SHUTTING_DOWN.is_set():
+        return
+    error = future.exception()
+    if error is not None:
+        from worker.pipeline import mark_run_failed
+        logger.error("Job %s did not complete: %s", job_data.get("id"), error)
+        mark_run_failed(job_data, error)
+
+
+def _fail_unfinished_jobs(executor: ProcessPoolExecutor) -> None:
+    """
+    Shut the pool down, give running jobs SHUTDOWN_GRACE_SECONDS to finish, then kill
+    the workers and mark the jobs they were still running (and any never started) as
+    failed: Cloud Tasks won't retry them, so their runs would otherwise stay IN_PROGRESS.
+    """
+    _SHUTTING_DOWN.set()
+    with _PENDING_LOCK:
+        pending = dict(_PENDING_JOBS)
+    # shutdown() drops the executor's reference to its workers, so take them first
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    _, not_done = wait(pending, timeout=SHUTDOWN_GRACE_SECONDS)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    abandoned = [job_data for future, job_data in pending.items() if future in not_done or future.cancelled()]
+    if not abandoned:
+        return
+    from worker.pipeline import mark_run_failed
+    for job_data in abandoned:
+        logger.warning("Job %s abandoned by worker shutdown", job_data.get("id"))
+        mark_run_failed(job_data, RuntimeError("Worker shut down before the job finished"))
+
+
 class CloudTasksHandler(BaseHTTPRequestHandler):
     def do_POST(self):
         """Handle Cloud Tasks HTTP requests"""
@@ -48,26 +138,54 @@ class CloudTasksHandler(BaseHTTPRequestHandler):
             # Read the request body
             post_data = self.rfile.read(content_length)
             
-            # Parse the job data from Cloud Tasks
-            job_data = json.loads(post_data.decode('utf-8'))
-            logger.info(f"Received Cloud Task: {job_data}")
-            
-            # Process the job
-            result = process_job_payload(job_data)
+            # Already loaded by main() after startup; cheap after the first request
+            from worker.pipeline import run_job, validate_job
             
-            # Send success response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(result).encode('utf-8'))
+            # Parse the job data from Cloud Tasks (json accepts the raw UTF-8 bytes directly)
+            job_data = json.loads(post_data)
+            logger.info("Received Cloud Task %s for run %s", job_data.get("id"), job_data.get("runId"))
+            logger.debug("Cloud Task payload: %s", job_data)
+            validate_job(job_data)
             
         except Exception as e:
-            logger.exception(f"Error processing Cloud Task: {e}")
+            logger.exception("Error processing Cloud Task: %s", e)
             self.send_response(500)
             self.send_header('Content-Type', 'application/json')
             self.end_headers()
             error_response = {"error": str(e)}
             self.wfile.write(json.dumps(error_response).encode('utf-8'))
+            return
+        
+        # At capacity: let Cloud Tasks back off and retry rather than queueing jobs in memory
+        if not _JOB_SLOTS.acquire(blocking=False):
+            logger.warning("All %s job slots busy, rejecting Cloud Task %s", WORKER_CONCURRENCY, job_data["id"])
+            self.send_response(429)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(b'{"error": "worker at capacity"}')
+            return
+        
+        # Acknowledge the task before starting any work, so a long crawl can never run into
+        # the Cloud Tasks dispatch deadline and be retried as a duplicate
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps({"accepted": job_data["id"]}).encode('utf-8'))
+        self.wfile.flush()
+        
+        # Hand the job off to the pool; its slot is released when the job finishes and
+        # run status in the database tracks its progress
+        try:
+            future = _submit_job(run_job, job_data)
+            with _PENDING_LOCK:
+                _PENDING_JOBS[future] = job_data
+            future.add_done_callback(functools.partial(_job_done, job_data))
+        except Exception as e:
+            _JOB_SLOTS.release()
+            # The task is already acknowledged, so the run itself has to record the failure
+            from worker.pipeline import mark_run_failed
+            logger.exception("Failed to start job %s: %s", job_data["id"], e)
+            mark_run_failed(job_data, e)
 
     def do_GET(self):
         """Health check endpoint"""
@@ -86,86 +204,59 @@ class CloudTasksHandler(BaseHTTPRequestHandler):
 
 
 
-def process_job_payload(job: dict):
+class ReusePortHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer that lets several processes bind the same port so the kernel balances between them."""
+
+    def server_bind(self):
+        if hasattr(socket, "SO_REUSEPORT"):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+def fork_server_processes(count: int) -> list:
     """
-    Perform crawl + llms generation with change detection. Return dict with result metadata.
+    Fork count - 1 extra server processes.
+    Returns the child pids in the parent and an empty list in each child.
     """
-    job_id = job.get("id")
-    url = job.get("url")
-    project_id = job.get("projectId")
-    run_id = job.get("runId")
-    is_scheduled = job.get("isScheduled", False)  # Whether this is a scheduled job
-    is_initial_run = job.get("isInitialRun", False)  # Whether this is the initial run for a new project
-    
-    if not job_id or not url or not project_id or not run_id:
-        raise ValueError("job must contain id+url+project id+run id")
-    
-    # Initialize data fetcher for all database operations
-    data_fetcher = DataFetcher()
-    
-    # Update run status to IN_PROGRESS
-    update_run_status(data_fetcher, run_id, RUN_STATUS_IN_PROGRESS, project_id, is_scheduled, is_initial_run)
-
-    # crawl site with change detection
-    crawl_opts = {
-        "max_pages": int(os.environ.get(ENV_CRAWL_MAX_PAGES, 100)),
-        "max_depth": int(os.environ.get(ENV_CRAWL_MAX_DEPTH, 2)),
-        "delay": float(os.environ.get(ENV_CRAWL_DELAY, 0.5)),
-    }
-    
-    logger.info("starting crawl with change detection for %s with opts %s", url, crawl_opts)
-    crawl_result = crawl_with_change_detection(
-        url, 
-        project_id, 
-        run_id, 
-        data_fetcher,
-        **crawl_opts
-    )
-    
-    # If no changes detected, we can skip llms.txt generation
-    if not crawl_result.get("changes_detected", True):
-        logger.info("No changes detected, skipping llms.txt generation")
-        update_run_status(data_fetcher, run_id, RUN_STATUS_COMPLETE_NO_DIFFS, project_id, is_scheduled, is_initial_run, "No changes detected, skipping generation")
-        return {
-            "s3_url_txt": None,
-            "pages_crawled": 0,
-            "local_files_deleted": True,
-            "changes_detected": False,
-            "message": "No changes detected"
-        }
-
-    logger.info("crawl finished: crawled %s pages", crawl_result.get("pages_crawled"))
-
-    # generate llms file in memory
-    txt_content = generate_llms_text(crawl_result, job_id)
-
-    # S3 upload with database updates directly from memory
-    changes_detected = crawl_result.get("changes_detected", True)
-    txt_filename = f"{LLMS_TXT_FILENAME_PREFIX}{job_id}{LLMS_TXT_FILENAME_SUFFIX}"
-    
-    s3_url_txt = maybe_upload_s3_from_memory(data_fetcher, txt_content, txt_filename, run_id, project_id, changes_detected, is_scheduled, is_initial_run)
+    children = []
+    for _ in range(count - 1):
+        pid = os.fork()
+        if pid == 0:
+            return []
+        children.append(pid)
+    return children
+
 
-    result = {
-        "s3_url_txt": s3_url_txt,
-        "pages_crawled": crawl_result.get("pages_crawled"),
-        "local_files_deleted": True,  # Always true since we don't create local files
-        "changes_detected": crawl_result.get("changes_detected", True),
-        "changed_pages": crawl_result.get("changed_pages", []),
-        "new_pages": crawl_result.get("new_pages", []),
-        "unchanged_pages": crawl_result.get("unchanged_pages", [])
-    }
-    return result
+def handle_termination(signum, frame):
+    """Turn SIGTERM from Cloud Run into the same clean shutdown as Ctrl-C."""
+    raise KeyboardInterrupt
 
 
 def main():
+    signal.signal(signal.SIGTERM, handle_termination)
     port = int(os.environ.get(ENV_PORT, DEFAULT_PORT))
     
-    # Start HTTP server for Cloud Tasks
-    server = HTTPServer(("0.0.0.0", port), CloudTasksHandler)
-    logger.info("Cloud Tasks worker listening on port %s", port)
+    # Extra server processes only help where the kernel can share the port between them
+    web_concurrency = int(os.environ.get(ENV_WEB_CONCURRENCY, DEFAULT_WEB_CONCURRENCY))
+    children = []
+    if web_concurrency > 1 and hasattr(socket, "SO_REUSEPORT"):
+        children = fork_server_processes(web_concurrency)
+    
+    global EXECUTOR
+    EXECUTOR = _create_executor()
+    
+    # Start HTTP server for Cloud Tasks; each request gets its own thread so
+    # health checks and new tasks aren't queued behind one another
+    server = ReusePortHTTPServer(("0.0.0.0", port), CloudTasksHandler)
+    logger.info("Cloud Tasks worker (pid %s) listening on port %s", os.getpid(), port)
+    
+    # Load the crawler/Supabase/S3 stack in the background so health checks pass during cold start
+    threading.Thread(target=importlib.import_module, args=("worker.pipeline",), daemon=True).start()
     
     try:
-        server.serve_forever()
+        # Block in select() until a request arrives instead of waking up every
+        # 0.5s to poll for shutdown; SIGTERM interrupts the wait directly
+        server.serve_forever(poll_interval=None)
     except KeyboardInterrupt:
         logger.info("Worker shutting down (KeyboardInterrupt)")
     except Exception as e:
@@ -173,8 +264,22 @@ def main():
     finally:
         try:
             server.shutdown()
+            server.server_close()
         except Exception:
             pass
+        # Cloud Run only signals the parent, so pass the shutdown on to the other server
+        # processes before waiting out our own jobs; they run their grace periods alongside
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        _fail_unfinished_jobs(EXECUTOR)
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
         logger.info("worker exited cleanly")
 
 if __name__ == "__main__":
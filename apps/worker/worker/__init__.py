@@ -9,20 +9,30 @@ Modules:
 - crawler: Web crawling with change detection
 - change_detection: Content change detection using headers and hashing
 - llms_generator: Generate LLMS.txt formatted content
+- pipeline: Job processing (crawl, generate, store) run by the HTTP worker
 - storage: S3 uploads, database operations, and scheduling
 - cloud_tasks_client: Google Cloud Tasks integration
 - constants: Application constants and configuration
 """
 
-from .crawler import crawl_with_change_detection
-from .change_detection import ChangeDetector
-from .llms_generator import generate_llms_text
-from .storage import update_run_status, maybe_upload_s3_from_memory
-from .database import get_supabase_client
-from .s3_storage import upload_content_to_s3
-from .webhooks import call_webhooks_for_project
-from .scheduling import schedule_next_run, calculate_next_run_time
-from .cloud_tasks_client import get_cloud_tasks_client
+import importlib
+
+# Submodules are imported on first attribute access (PEP 562) so that importing
+# e.g. worker.constants doesn't pull in boto3, supabase and lxml at startup.
+_LAZY = {
+    "crawl_with_change_detection": ".crawler",
+    "ChangeDetector": ".change_detection",
+    "generate_llms_text": ".llms_generator",
+    "update_run_status": ".storage",
+    "maybe_upload_s3_from_memory": ".storage",
+    "get_supabase_client": ".database",
+    "upload_content_to_s3": ".s3_storage",
+    "get_s3_client": ".s3_storage",
+    "call_webhooks_for_project": ".webhooks",
+    "schedule_next_run": ".scheduling",
+    "calculate_next_run_time": ".scheduling",
+    "get_cloud_tasks_client": ".cloud_tasks_client",
+}
 
 __version__ = "0.1.0"
 __all__ = [
@@ -33,8 +43,17 @@ __all__ = [
     "update_run_status",
     "maybe_upload_s3_from_memory",
     "upload_content_to_s3",
+    "get_s3_client",
     "call_webhooks_for_project",
     "schedule_next_run",
     "calculate_next_run_time",
     "get_cloud_tasks_client",
 ]
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,37 +1,166 @@
 # apps/worker/worker/change_detection.py
 """Change detection for web pages using headers and content hashing."""
 
+import functools
 import hashlib
+import io
 import logging
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 from urllib.parse import urlparse
-import xml.etree.ElementTree as ET
 
+import lxml.html
 import requests
-from bs4 import BeautifulSoup
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from .data_fetcher import DataFetcher
 from .constants import (
     DEFAULT_USER_AGENT,
     HEAD_TIMEOUT,
     DEFAULT_TIMEOUT,
-    SITEMAP_NAMESPACE
+    SITEMAP_NAMESPACE,
+    CHANGE_DETECTION_MAX_WORKERS,
+    MAX_REQUESTS_PER_HOST,
+    SITEMAP_FETCH_WORKERS,
+    HTTP_POOL_SIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_RETRY_BACKOFF,
+    CONTENT_HASH_ALGORITHM,
+    STREAM_CHUNK_SIZE,
+    URL_CACHE_SIZE,
+    REVISION_INSERT_BATCH_SIZE,
+    HTML_CONTENT_TYPES,
+    MAX_PAGE_BYTES
 )
 
 logger = logging.getLogger(__name__)
 
+_WS_RE = re.compile(r'\s+')
+
+# Clark-notation sitemap tags, built once rather than on every parse
+_SITEMAP_URL_TAG = f'{{{SITEMAP_NAMESPACE}}}url'
+_SITEMAP_LOC_TAG = f'{{{SITEMAP_NAMESPACE}}}loc'
+_SITEMAP_INDEX_ENTRY_TAG = f'{{{SITEMAP_NAMESPACE}}}sitemap'
+
+def response_validators(headers) -> Dict[str, str]:
+    """
+    Pick the HTTP cache validators (ETag / Last-Modified) out of response headers.
+    They're stored in revision metadata so the next check can skip downloading unchanged pages.
+    """
+    validators = {}
+    etag = headers.get('ETag')
+    if etag:
+        validators['etag'] = etag
+    last_modified = headers.get('Last-Modified')
+    if last_modified:
+        validators['last_modified'] = last_modified
+    return validators
+
+
+def skipped_content_reason(headers) -> Optional[str]:
+    """
+    Why a 200 response's body isn't stored by the crawl (not HTML, or over MAX_PAGE_BYTES);
+    None if it is. Change detection uses the same rule, so skipped pages don't show up as changed.
+    """
+    content_type = headers.get("Content-Type", "").split(";", 1)[0].strip().lower()
+    if content_type and content_type not in HTML_CONTENT_TYPES:
+        return f"non-HTML content ({content_type})"
+    content_length = headers.get("Content-Length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_PAGE_BYTES:
+        return f"oversized content ({content_length} bytes)"
+    return None
+
+
+def raw_content_hash(body: bytes) -> str:
+    """
+    Hash of a page's raw response bytes, stored in revision metadata as raw_content_sha256.
+    Identical bytes can't have changed, so a match skips parsing the page at all.
+    """
+    return hashlib.new(CONTENT_HASH_ALGORITHM, body, usedforsecurity=False).hexdigest()
+
+
+def _decode_body(response: requests.Response, body: bytes) -> str:
+    """Decode a streamed body exactly like response.text would, so content hashes stay comparable."""
+    encoding = response.encoding
+    if encoding is None:
+        encoding = requests.compat.chardet.detect(body)['encoding']
+    try:
+        return str(body, encoding, errors='replace')
+    except (LookupError, TypeError):
+        return str(body, errors='replace')
+
+
+def parse_html(html: Union[str, bytes], encoding: Optional[str] = None) -> Optional[lxml.html.HtmlElement]:
+    """
+    Parse a page with lxml; None when it's empty or has no elements (only a doctype,
+    comment or processing instruction). Raw bytes are decoded by the parser using encoding.
+    """
+    if not html or not html.strip():
+        return None
+    try:
+        if isinstance(html, bytes):
+            return lxml.html.document_fromstring(html, parser=lxml.html.HTMLParser(encoding=encoding))
+        try:
+            return lxml.html.document_fromstring(html)
+        except ValueError:
+            # lxml refuses str input that carries an XML encoding declaration
+            return lxml.html.document_fromstring(html.encode('utf-8'))
+    except etree.ParserError:
+        return None
+
+
+# The same URLs come up in the sitemap, the database and page info, so normalizing
+# and parsing them is memoized
+@functools.lru_cache(maxsize=URL_CACHE_SIZE)
+def normalize_url(url: str) -> str:
+    """Normalize URL to ensure consistent comparison."""
+    if not url:
+        return url
+    
+    # Ensure URL has a scheme - if missing, add https://
+    if not url.startswith(('http://', 'https://')):
+        logger.debug("URL missing scheme, adding https://: %s", url)
+        url = f"https://{url}"
+    
+    return url
+
+
+_urlparse_cached = functools.lru_cache(maxsize=URL_CACHE_SIZE)(urlparse)
+
+
+def _revision_hash_algorithm(revision: Dict) -> str:
+    """Algorithm a revision's content hash was computed with (untagged revisions predate the tag and are sha256)."""
+    return (revision.get('metadata') or {}).get('hash_algorithm') or 'sha256'
+
+
+def _same_content(old_revision: Optional[Dict], content_hash: str) -> bool:
+    """Whether an old revision has the same content hash, computed with the current algorithm."""
+    return bool(old_revision and old_revision.get('content_sha256') == content_hash
+                and _revision_hash_algorithm(old_revision) == CONTENT_HASH_ALGORITHM)
+
+
+# Page checks are network-bound, so existing pages are fetched in parallel on a shared pool
+_FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=CHANGE_DETECTION_MAX_WORKERS, thread_name_prefix="change-detection")
+
 
 class ChangeDetector:
     """
     1. Sitemap + Headers first: If site has sitemap.xml, fetch and use LastMod / URLs; 
-       request HEAD for ETag/Last-Modified; if unchanged, skip heavy fetch.
+       send a conditional GET with the stored ETag/Last-Modified; on 304, skip the body.
     2. Hash-based diff: For fetched HTML (post-render if needed), compute SHA256 of the 
        normalized important content (strip timestamp-like content). Save hash in DB; 
        if changed — enqueue generation via Cloud Tasks for Python workers to process.
     """
     
+    # Elements whose text isn't page content; template and ruby annotation (rt/rp) text
+    # was never part of get_text() either
+    _STRIP_TAGS = ('script', 'style', 'noscript', 'iframe', 'template', 'rt', 'rp')
+    
     def __init__(self, project_id: str, run_id: str, data_fetcher: DataFetcher):
         self.project_id = project_id
         self.run_id = run_id
@@ -40,6 +169,22 @@ class ChangeDetector:
         self.session.headers.update({
             "User-Agent": DEFAULT_USER_AGENT
         })
+        # The default pool keeps only 10 connections per host, fewer than the parallel checks
+        # against one site, so size it up to avoid re-handshaking on overflow
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_SIZE,
+            pool_maxsize=HTTP_POOL_SIZE,
+            max_retries=Retry(total=HTTP_MAX_RETRIES, backoff_factor=HTTP_RETRY_BACKOFF)
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Per-host limits so parallel checks don't hammer a single site
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_slots_lock = threading.Lock()
+    
+    def close(self) -> None:
+        """Close the HTTP session and its pooled connections."""
+        self.session.close()
     
     def detect_changes(self, base_url: str) -> Dict[str, any]:
         """
@@ -50,40 +195,40 @@ class ChangeDetector:
         - new_pages: List[Dict] - newly discovered pages
         - unchanged_pages: List[Dict] - pages that haven't changed
         """
-        logger.info(f"Starting change detection for project {self.project_id}")
+        logger.info("Starting change detection for project %s", self.project_id)
         
         # Step 1: Check sitemap and headers first
         sitemap_urls = self._fetch_sitemap_urls(base_url)
-        logger.info(f"Found {len(sitemap_urls)} URLs in sitemap")
+        logger.info("Found %s URLs in sitemap", len(sitemap_urls))
         
         # Get existing pages from database with their current revisions
         existing_pages = self.data_fetcher.get_existing_pages_with_revisions(self.project_id)
-        existing_urls = {page['url'] for page in existing_pages}
-        logger.info(f"Found {len(existing_pages)} existing pages in database")
+        # One lookup table for both the URL union and the page checks
+        existing_pages_by_url = {page['url']: page for page in existing_pages}
+        existing_urls = existing_pages_by_url.keys()
+        logger.info("Found %s existing pages in database", len(existing_pages))
         
-        # Step 2: Hash-based diff for fetched HTML content
-        # Batch process all URLs to minimize DB calls
-        all_urls = set(sitemap_urls) | existing_urls | {base_url}
-        logger.info(f"Processing {len(all_urls)} URLs total (sitemap: {len(sitemap_urls)}, existing: {len(existing_urls)}, base_url included)")
+        # Step 2: Split URLs up front. Sitemap URLs (and the base URL) we've never seen are new
+        # and need no network call; every existing page gets a hash-based diff
+        new_urls = set(sitemap_urls)
+        new_urls.add(base_url)
+        new_urls.difference_update(existing_urls)
+        check_urls = list(existing_urls)
+        total_checked = len(new_urls) + len(check_urls)
+        logger.info("Processing %s URLs total (sitemap: %s, existing: %s, base_url included)",
+                    total_checked, len(sitemap_urls), len(existing_urls))
         
-        # Process all URLs in batches for efficiency
+        new_pages = [self._get_page_info(url) for url in new_urls]
         changed_pages = []
         unchanged_pages = []
-        new_pages = []
-        
-        # Process URLs in batches
-        from .constants import DEFAULT_BATCH_SIZE
-        batch_size = DEFAULT_BATCH_SIZE
-        url_list = list(all_urls)
         
-        for i in range(0, len(url_list), batch_size):
-            batch_urls = url_list[i:i + batch_size]
-            logger.info(f"Processing batch {i//batch_size + 1}/{(len(url_list) + batch_size - 1)//batch_size}")
-            
-            batch_results = self._process_url_batch(batch_urls, existing_pages, sitemap_urls)
-            changed_pages.extend(batch_results['changed'])
-            unchanged_pages.extend(batch_results['unchanged'])
-            new_pages.extend(batch_results['new'])
+        # Check all existing pages in one pass: the fetch pool and per-host slots already bound
+        # concurrency, and fixed-size batches would leave threads idle waiting on each batch's slowest page
+        if check_urls:
+            check_results = self._check_existing_pages(check_urls, existing_pages_by_url)
+            changed_pages.extend(check_results['changed'])
+            unchanged_pages.extend(check_results['unchanged'])
+            new_pages.extend(check_results['new'])
                 
         has_changes = len(changed_pages) > 0 or len(new_pages) > 0
         
@@ -92,122 +237,171 @@ class ChangeDetector:
             'changed_pages': changed_pages,
             'new_pages': new_pages,
             'unchanged_pages': unchanged_pages,
-            'total_checked': len(all_urls)
+            'total_checked': total_checked
         }
         
-        logger.info(f"Change detection complete: {len(changed_pages)} changed, "
-                   f"{len(new_pages)} new, {len(unchanged_pages)} unchanged")
-        logger.info(f"Has changes: {has_changes}")
+        logger.info("Change detection complete: %s changed, %s new, %s unchanged",
+                    len(changed_pages), len(new_pages), len(unchanged_pages))
+        logger.info("Has changes: %s", has_changes)
         if new_pages:
-            logger.info(f"New pages: {[p['url'] for p in new_pages]}")
+            logger.info("New pages: %s", [p['url'] for p in new_pages])
         if changed_pages:
-            logger.info(f"Changed pages: {[p['url'] for p in changed_pages]}")
+            logger.info("Changed pages: %s", [p['url'] for p in changed_pages])
         
         return result
     
     def _fetch_sitemap_urls(self, base_url: str) -> List[str]:
-        """Fetch URLs from sitemap.xml if available."""
+        """
+        Fetch URLs from sitemap.xml if available.
+        A plain sitemap's URLs are cached on the project along with its validators, so when the
+        server answers 304 the cached list is used without downloading or parsing it again.
+        """
         parsed = urlparse(base_url)
         sitemap_url = f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"
         
         try:
-            response = self.session.get(sitemap_url, timeout=HEAD_TIMEOUT)
+            cache = self.data_fetcher.get_sitemap_cache(self.project_id) or {}
+            cached_urls = cache.get('sitemap_urls_cache')
+            headers = {}
+            if cached_urls is not None:
+                if cache.get('sitemap_etag'):
+                    headers['If-None-Match'] = cache['sitemap_etag']
+                if cache.get('sitemap_last_modified'):
+                    headers['If-Modified-Since'] = cache['sitemap_last_modified']
+            
+            response = self.session.get(sitemap_url, headers=headers or None, timeout=HEAD_TIMEOUT)
+            if response.status_code == 304 and headers:
+                logger.info("Sitemap %s not modified, using %s cached URLs", sitemap_url, len(cached_urls))
+                return cached_urls
             if response.status_code == 200:
-                return self._parse_sitemap(response.text)
+                urls, sub_sitemap_urls = self._read_sitemap(response.content)
+                if sub_sitemap_urls:
+                    urls.extend(self._fetch_sub_sitemaps(sub_sitemap_urls))
+                # A URL can be listed more than once, or in several of an index's sitemaps;
+                # keep the first of each
+                urls = list(dict.fromkeys(urls))
+                # An index can stay the same while its sitemaps change, so it's never cached
+                if not sub_sitemap_urls:
+                    validators = response_validators(response.headers)
+                    if validators.get('etag') or validators.get('last_modified'):
+                        self.data_fetcher.update_sitemap_cache(
+                            self.project_id, validators.get('etag'), validators.get('last_modified'), urls
+                        )
+                return urls
         except Exception as e:
-            logger.warning(f"Failed to fetch sitemap {sitemap_url}: {e}")
+            logger.warning("Failed to fetch sitemap %s: %s", sitemap_url, e)
         
         return []
     
-    def _parse_sitemap(self, sitemap_xml: str) -> List[str]:
-        """Parse sitemap XML and extract URLs."""
+    def _parse_sitemap(self, sitemap_xml: bytes) -> List[str]:
+        """Parse sitemap XML and extract URLs, fetching the sitemaps of a sitemap index."""
+        urls, sub_sitemap_urls = self._read_sitemap(sitemap_xml)
+        if sub_sitemap_urls:
+            urls.extend(self._fetch_sub_sitemaps(sub_sitemap_urls))
+        return urls
+    
+    def _read_sitemap(self, sitemap_xml: bytes) -> Tuple[List[str], List[str]]:
+        """
+        Read page URLs and sub-sitemap URLs (for a sitemap index) from sitemap XML.
+        Takes the raw response bytes and streams through them, freeing each entry once read,
+        so memory stays flat on sitemaps with tens of thousands of URLs.
+        """
         urls = []
+        sub_sitemap_urls = []
         try:
-            root = ET.fromstring(sitemap_xml)
-            
-            # Handle both sitemap and sitemapindex
-            sitemap_ns = f"{{{SITEMAP_NAMESPACE}}}"
-            if root.tag.endswith('sitemapindex'):
-                # This is a sitemap index, get individual sitemaps
-                for sitemap in root.findall(f'.//{sitemap_ns}sitemap'):
-                    loc = sitemap.find(f'{sitemap_ns}loc')
-                    if loc is not None:
-                        # Fetch individual sitemap
-                        try:
-                            sub_response = self.session.get(loc.text, timeout=HEAD_TIMEOUT)
-                            if sub_response.status_code == 200:
-                                urls.extend(self._parse_sitemap(sub_response.text))
-                        except Exception as e:
-                            logger.warning(f"Failed to fetch sub-sitemap {loc.text}: {e}")
-            else:
-                # Regular sitemap
-                for url in root.findall(f'.//{sitemap_ns}url'):
-                    loc = url.find(f'{sitemap_ns}loc')
-                    if loc is not None:
+            # Handle both sitemap (<url> entries) and sitemapindex (<sitemap> entries)
+            for _, entry in etree.iterparse(io.BytesIO(sitemap_xml), events=('end',),
+                                            tag=(_SITEMAP_URL_TAG, _SITEMAP_INDEX_ENTRY_TAG),
+                                            resolve_entities=False):
+                loc = entry.find(_SITEMAP_LOC_TAG)
+                if loc is not None:
+                    if entry.tag == _SITEMAP_INDEX_ENTRY_TAG:
+                        sub_sitemap_urls.append(loc.text)
+                    else:
                         # Normalize URL to ensure consistent comparison with existing pages
-                        normalized_url = self._normalize_url(loc.text)
-                        urls.append(normalized_url)
-        except ET.ParseError as e:
-            logger.warning(f"Failed to parse sitemap XML: {e}")
+                        urls.append(normalize_url(loc.text))
+                
+                # Drop the entry and the ones already read before it
+                entry.clear()
+                while entry.getprevious() is not None:
+                    del entry.getparent()[0]
+        except etree.XMLSyntaxError as e:
+            logger.warning("Failed to parse sitemap XML: %s", e)
         
+        return urls, sub_sitemap_urls
+    
+    def _fetch_sub_sitemaps(self, sub_sitemap_urls: List[str]) -> List[str]:
+        """
+        Fetch the individual sitemaps of a sitemap index (each only once) in parallel.
+        A pool of its own, since nested indexes fetch from inside these threads.
+        """
+        urls = []
+        sub_sitemap_urls = list(dict.fromkeys(sub_sitemap_urls))
+        with ThreadPoolExecutor(max_workers=min(SITEMAP_FETCH_WORKERS, len(sub_sitemap_urls))) as executor:
+            for sub_urls in executor.map(self._fetch_sub_sitemap, sub_sitemap_urls):
+                urls.extend(sub_urls)
         return urls
     
-    def _normalize_url(self, url: str) -> str:
+    def _fetch_sub_sitemap(self, sub_sitemap_url: str) -> List[str]:
+        """Fetch and parse one sitemap listed in a sitemap index."""
+        try:
+            sub_response = self.session.get(sub_sitemap_url, timeout=HEAD_TIMEOUT)
+            if sub_response.status_code == 200:
+                return self._parse_sitemap(sub_response.content)
+        except Exception as e:
+            logger.warning("Failed to fetch sub-sitemap %s: %s", sub_sitemap_url, e)
+        return []
+    
+    @staticmethod
+    def _normalize_url(url: str) -> str:
         """Normalize URL to ensure consistent comparison."""
-        if not url:
-            return url
-        
-        # Ensure URL has a scheme - if missing, add https://
-        if not url.startswith(('http://', 'https://')):
-            logger.debug(f"URL missing scheme, adding https://: {url}")
-            url = f"https://{url}"
-        
-        return url
+        return normalize_url(url)
     
     
-    def _process_url_batch(self, urls: List[str], existing_pages: List[Dict], sitemap_urls: List[str]) -> Dict[str, List[Dict]]:
-        """Process a batch of URLs for change detection."""
-        changed_pages = []
-        unchanged_pages = []
-        new_pages = []
-        
-        # Create lookup for existing pages
-        existing_pages_by_url = {page['url']: page for page in existing_pages}
+    def _check_existing_pages(self, urls: List[str], existing_pages_by_url: Dict[str, Dict]) -> Dict[str, List[Dict]]:
+        """Check existing pages for changes in parallel on the fetch pool, classifying each as changed, unchanged or new."""
+        results = {
+            'changed': [],
+            'unchanged': [],
+            'new': []
+        }
         
-        logger.debug(f"Processing {len(urls)} URLs against {len(existing_pages_by_url)} existing pages")
-        logger.debug(f"Existing page URLs: {list(existing_pages_by_url.keys())[:5]}...")  # Show first 5 for debugging
+        logger.debug("Checking %d of %d existing pages", len(urls), len(existing_pages_by_url))
         
-        for url in urls:
-            try:
-                if url in existing_pages_by_url:
-                    # Existing page - check for changes
-                    existing_page = existing_pages_by_url[url]
-                    logger.debug(f"Found existing page for URL: {url}")
-                    change_result = self._check_page_changes(url, existing_page)
-                    
-                    if change_result['has_changed']:
-                        changed_pages.append({
-                            **existing_page,
-                            'change_reason': change_result['reason'],
-                            'old_revision_id': change_result.get('old_revision_id')
-                        })
-                    else:
-                        unchanged_pages.append(existing_page)
-                else:
-                    # New page
-                    logger.debug(f"Treating as new page: {url}")
-                    new_pages.append(self._get_page_info(url))
-                    
-            except Exception as e:
-                logger.warning(f"Error processing URL {url}: {e}")
-                # If we can't process, treat as new to be safe
-                new_pages.append(self._get_page_info(url))
+        # map() keeps results in URL order
+        for kind, page in _FETCH_EXECUTOR.map(lambda url: self._process_one_url(url, existing_pages_by_url[url]), urls):
+            results[kind].append(page)
         
-        return {
-            'changed': changed_pages,
-            'unchanged': unchanged_pages,
-            'new': new_pages
-        }
+        return results
+    
+    def _process_one_url(self, url: str, existing_page: Dict) -> Tuple[str, Dict]:
+        """Classify an existing page as ('changed' | 'unchanged', page), or 'new' if it can't be checked."""
+        try:
+            with self._host_slot(url):
+                change_result = self._check_page_changes(url, existing_page)
+            
+            if change_result['has_changed']:
+                return 'changed', {
+                    **existing_page,
+                    'change_reason': change_result['reason'],
+                    'old_revision_id': change_result.get('old_revision_id'),
+                    'new_content_hash': change_result.get('new_content_hash')
+                }
+            return 'unchanged', existing_page
+            
+        except Exception as e:
+            logger.warning("Error processing URL %s: %s", url, e)
+            # If we can't process, treat as new to be safe
+            return 'new', self._get_page_info(url)
+    
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        """Get the semaphore limiting concurrent requests to the URL's host."""
+        host = _urlparse_cached(url).netloc
+        with self._host_slots_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(MAX_REQUESTS_PER_HOST)
+        return slot
     
     def _check_page_changes(self, url: str, existing_page: Dict) -> Dict[str, any]:
         """
@@ -222,7 +416,7 @@ class ChangeDetector:
             return self._check_content_hash_detailed(url, existing_page, current_revision)
             
         except Exception as e:
-            logger.warning(f"Error checking page {url}: {e}")
+            logger.warning("Error checking page %s: %s", url, e)
             # If we can't check, assume it changed to be safe
             return {
                 'has_changed': True,
@@ -233,25 +427,84 @@ class ChangeDetector:
     def _check_content_hash_detailed(self, url: str, existing_page: Dict, current_revision: Optional[Dict]) -> Dict[str, any]:
         """Check if page content has changed by comparing SHA256 hashes."""
         try:
-            # Fetch full page
-            response = self.session.get(url, timeout=DEFAULT_TIMEOUT)
-            if response.status_code != 200:
-                return {
-                    'has_changed': True,
-                    'reason': f'HTTP {response.status_code} on full fetch',
-                    'old_revision_id': current_revision.get('id') if current_revision else None
-                }
+            # One conditional GET: a 304 costs no body, a 200 brings the content to hash
+            headers = {}
+            if current_revision:
+                revision_metadata = current_revision.get('metadata') or {}
+                if revision_metadata.get('etag'):
+                    headers['If-None-Match'] = revision_metadata['etag']
+                if revision_metadata.get('last_modified'):
+                    headers['If-Modified-Since'] = revision_metadata['last_modified']
             
-            # Extract and normalize content
-            content = self._extract_normalized_content(response.text)
-            content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+            # Fetch full page, streaming the body so it's only decoded and parsed when needed
+            response = self.session.get(url, headers=headers, stream=True, timeout=DEFAULT_TIMEOUT)
+            try:
+                if response.status_code == 304 and headers:
+                    logger.info("Page %s not modified (304)", url)
+                    return {
+                        'has_changed': False,
+                        'reason': 'Not modified (HTTP 304)',
+                        'old_revision_id': current_revision.get('id')
+                    }
+                if response.status_code != 200:
+                    return {
+                        'has_changed': True,
+                        'reason': f'HTTP {response.status_code} on full fetch',
+                        'old_revision_id': current_revision.get('id') if current_revision else None
+                    }
+                
+                # The crawl doesn't store these pages, so there's nothing to compare or re-crawl
+                skip_reason = skipped_content_reason(response.headers)
+                if skip_reason is None:
+                    # Hash the raw bytes as they arrive
+                    raw_hasher = hashlib.new(CONTENT_HASH_ALGORITHM, usedforsecurity=False)
+                    chunks = []
+                    size = 0
+                    for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > MAX_PAGE_BYTES:
+                            skip_reason = f"oversized content (over {MAX_PAGE_BYTES} bytes)"
+                            break
+                        raw_hasher.update(chunk)
+                        chunks.append(chunk)
+                if skip_reason:
+                    logger.info("Page %s not crawled: %s", url, skip_reason)
+                    return {
+                        'has_changed': False,
+                        'reason': f'Not crawled: {skip_reason}',
+                        'old_revision_id': current_revision.get('id') if current_revision else None
+                    }
+                body = b''.join(chunks)
+            finally:
+                response.close()
+            
+            # Byte-identical to the stored revision: skip decoding and parsing entirely
+            if current_revision and _revision_hash_algorithm(current_revision) == CONTENT_HASH_ALGORITHM:
+                stored_raw_hash = (current_revision.get('metadata') or {}).get('raw_content_sha256')
+                if stored_raw_hash and stored_raw_hash == raw_hasher.hexdigest():
+                    logger.info("Page %s unchanged (raw content hash matches)", url)
+                    return {
+                        'has_changed': False,
+                        'reason': 'Raw content unchanged',
+                        'old_revision_id': current_revision.get('id')
+                    }
+            
+            # Extract, normalize and hash content
+            # Parse the bytes directly when the response names its encoding (gives the same
+            # text as decoding first); otherwise decode like response.text would
+            try:
+                content_hash = self._content_hash(body, response.encoding) if response.encoding else None
+            except LookupError:
+                content_hash = None
+            if content_hash is None:
+                content_hash = self._content_hash(_decode_body(response, body))
             
             # Debug logging
-            logger.debug(f"Checking content hash for {url}: {content_hash[:8]}...")
+            logger.debug("Checking content hash for %s: %.8s...", url, content_hash)
             
             # Check if we have a current revision
             if not current_revision:
-                logger.info(f"No previous revision found for {url}, considering as changed")
+                logger.info("No previous revision found for %s, considering as changed", url)
                 return {
                     'has_changed': True,
                     'reason': 'No previous revision found',
@@ -259,8 +512,11 @@ class ChangeDetector:
                 }
             
             stored_hash = current_revision.get('content_sha256')
+            if stored_hash and _revision_hash_algorithm(current_revision) != CONTENT_HASH_ALGORITHM:
+                # Hashes from another algorithm can't be compared; re-hash into a new revision
+                stored_hash = None
             if not stored_hash:
-                logger.info(f"No stored hash for {url}, considering as changed")
+                logger.info("No stored hash for %s, considering as changed", url)
                 return {
                     'has_changed': True,
                     'reason': 'No stored content hash',
@@ -268,7 +524,7 @@ class ChangeDetector:
                 }
             
             if content_hash != stored_hash:
-                logger.info(f"Page {url} content hash changed: {stored_hash[:8]}... -> {content_hash[:8]}...")
+                logger.info("Page %s content hash changed: %s... -> %s...", url, stored_hash[:8], content_hash[:8])
                 return {
                     'has_changed': True,
                     'reason': f'Content hash changed: {stored_hash[:8]}... -> {content_hash[:8]}...',
@@ -276,7 +532,7 @@ class ChangeDetector:
                     'new_content_hash': content_hash
                 }
             
-            logger.info(f"Page {url} unchanged")
+            logger.info("Page %s unchanged", url)
             return {
                 'has_changed': False,
                 'reason': 'No changes detected',
@@ -284,39 +540,65 @@ class ChangeDetector:
             }
             
         except Exception as e:
-            logger.warning(f"Error checking content hash for {url}: {e}")
+            logger.warning("Error checking content hash for %s: %s", url, e)
             return {
                 'has_changed': True,
                 'reason': f'Error checking content hash: {str(e)}',
                 'old_revision_id': current_revision.get('id') if current_revision else None
             }
     
-    def _extract_normalized_content(self, html: str) -> str:
+    def _extract_normalized_content(self, html: Union[str, bytes], encoding: Optional[str] = None) -> str:
         """
         Extract and normalize content for hashing.
         Simplified approach - just remove scripts/styles and normalize whitespace.
+        Parses with lxml directly; the text matches what BeautifulSoup's get_text() gave,
+        so hashes stored by earlier runs stay comparable.
+        Raw bytes are decoded by the parser itself using the given encoding.
         """
-        soup = BeautifulSoup(html, 'lxml')
+        root = parse_html(html, encoding)
+        if root is None:
+            # Nothing but a doctype, comment or processing instruction: no text, as get_text() gave
+            return ""
         
-        # Remove script and style tags
-        for tag in soup(['script', 'style', 'noscript', 'iframe']):
-            tag.decompose()
+        return self._normalized_text(root)
+    
+    def _normalized_text(self, root: lxml.html.HtmlElement) -> str:
+        """Normalized text of a parsed page. Strips scripts/styles from the tree in place."""
+        # Remove script and style tags (keeping the text that follows them)
+        etree.strip_elements(root, *self._STRIP_TAGS, with_tail=False)
         
         # Get text content
-        text = soup.get_text()
+        text = root.text_content()
         
         # Remove excessive whitespace and normalize
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = _WS_RE.sub(' ', text).strip()
         
         return text
     
+    def _hash_text(self, text: str) -> str:
+        """
+        Hash of normalized content; the one place page hashes are computed.
+        It's a content fingerprint, not a security primitive, so FIPS-restricted builds may use any backend.
+        """
+        return hashlib.new(CONTENT_HASH_ALGORITHM, text.encode('utf-8'), usedforsecurity=False).hexdigest()
+    
+    def _content_hash(self, html: Union[str, bytes], encoding: Optional[str] = None) -> str:
+        """Hash of the normalized content of an HTML document."""
+        return self._hash_text(self._extract_normalized_content(html, encoding))
+    
+    def content_hash_from_tree(self, root: lxml.html.HtmlElement) -> str:
+        """
+        Content hash of an already parsed page, for callers that parsed it for other reasons.
+        Modifies the tree, so read anything else from it first.
+        """
+        return self._hash_text(self._normalized_text(root))
     
     def _get_page_info(self, url: str) -> Dict:
         """Get basic page info for a URL."""
         # Normalize URL to ensure consistent comparison
-        url = self._normalize_url(url)
+        url = normalize_url(url)
         
-        parsed = urlparse(url)
+        parsed = _urlparse_cached(url)
         return {
             'url': url,
             'path': parsed.path or '/',
@@ -326,49 +608,66 @@ class ChangeDetector:
             'metadata': {}
         }
     
-    def save_page_revision(self, page_id: str, content: str, title: str = "", 
-                          description: str = "", metadata: Dict = None, 
-                          old_revision_id: str = None) -> str:
-        """Save a new page revision to the database."""
-        try:
-            # Extract normalized content for hashing
-            normalized_content = self._extract_normalized_content(content)
-            content_hash = hashlib.sha256(normalized_content.encode('utf-8')).hexdigest()
-            
-            # Check if content hash has actually changed
-            if old_revision_id:
-                # Get the old revision to compare hashes
-                old_revision = self.data_fetcher.get_revision_by_id(old_revision_id)
-                if old_revision and old_revision.get('content_sha256') == content_hash:
-                    logger.info(f"Page {page_id} content hash unchanged ({content_hash[:8]}...), skipping revision creation")
-                    
-                    # Update page's last_seen_at but don't create new revision
-                    self.data_fetcher.update_page_last_seen(page_id)
-                    
-                    return old_revision_id  # Return existing revision ID
-            
-            # Create revision data with minimal metadata
-            revision_id = self.data_fetcher.create_page_revision(
-                page_id=page_id,
-                run_id=self.run_id,
-                content=content,
-                content_hash=content_hash,
-                title=title,
-                description=description,
-                metadata=metadata or {}
-            )
-            
-            if revision_id:
-                logger.info(f"Saved page revision {revision_id} for page {page_id} with hash {content_hash[:8]}...")
-                
-                # Update page's current_revision_id
-                self.data_fetcher.update_page_revision(page_id, revision_id)
-                      
-                return revision_id
-            else:
-                logger.error(f"Failed to save page revision for {page_id}")
-                return None
+    def save_page_revisions(self, revisions: List[Dict]) -> Dict[str, str]:
+        """
+        Save revisions for several pages with bulk writes instead of per-page round trips.
+        Each item has page_id and content, and optionally title, description, metadata,
+        content_hash (skips normalizing the content again), old_revision_id and
+        cached_old_revision (skips fetching the old revision). Returns {page_id: revision_id},
+        with the old revision's ID for pages whose content hash is unchanged.
+        """
+        revision_ids = {}
+        unchanged_page_ids = []
+        rows = []
+        # Errors are handled per page, so one bad page doesn't cost the rest of the run its revisions
+        for revision in revisions:
+            page_id = revision['page_id']
+            try:
+                content_hash = revision.get('content_hash') or self._content_hash(revision['content'])
                 
-        except Exception as e:
-            logger.error(f"Error saving page revision for {page_id}: {e}")
-            return None
+                old_revision_id = revision.get('old_revision_id')
+                if old_revision_id:
+                    old_revision = revision.get('cached_old_revision')
+                    if old_revision is None:
+                        old_revision = self.data_fetcher.get_revision_by_id(old_revision_id)
+                    if _same_content(old_revision, content_hash):
+                        logger.info("Page %s content hash unchanged (%s...), skipping revision creation", page_id, content_hash[:8])
+                        unchanged_page_ids.append(page_id)
+                        revision_ids[page_id] = old_revision_id
+                        continue
+            except Exception as e:
+                logger.error("Error preparing revision for page %s: %s", page_id, e)
+                continue
+            
+            rows.append({
+                'page_id': page_id,
+                'content': revision['content'],
+                'content_hash': content_hash,
+                'title': revision.get('title', ''),
+                'description': revision.get('description', ''),
+                'metadata': {**(revision.get('metadata') or {}), 'hash_algorithm': CONTENT_HASH_ALGORITHM}
+            })
+        
+        if unchanged_page_ids:
+            self.data_fetcher.update_pages_last_seen(unchanged_page_ids)
+        
+        saved = 0
+        for i in range(0, len(rows), REVISION_INSERT_BATCH_SIZE):
+            batch = rows[i:i + REVISION_INSERT_BATCH_SIZE]
+            created = self.data_fetcher.create_page_revisions(self.run_id, batch)
+            if len(created) < len(batch):
+                # One bad row fails the whole insert, so retry the batch's rows one at a time
+                logger.warning("Bulk revision insert failed for run %s, retrying %s rows individually", self.run_id, len(batch))
+                for row in batch:
+                    if row['page_id'] not in created:
+                        created.update(self.data_fetcher.create_page_revisions(self.run_id, [row]))
+            # Revisions the pages don't point at aren't reported as saved
+            if created and self.data_fetcher.update_pages_current_revision(created):
+                revision_ids.update(created)
+                saved += len(created)
+        
+        logger.info("Saved %s page revisions (%s unchanged) for run %s", saved, len(unchanged_page_ids), self.run_id)
+        if saved < len(rows):
+            logger.error("Failed to save %s page revisions for run %s", len(rows) - saved, self.run_id)
+        
+        return revision_ids
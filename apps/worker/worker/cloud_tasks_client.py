@@ -8,12 +8,14 @@ from datetime import datetime
 from typing import Optional, Dict, Any
 
 from google.cloud import tasks_v2
+from google.cloud.tasks_v2.services.cloud_tasks.transports import CloudTasksGrpcTransport
 from google.protobuf import timestamp_pb2
 
 from .constants import (
     CLOUD_TASKS_PROJECT_ID,
     CLOUD_TASKS_LOCATION,
     CLOUD_TASKS_QUEUE_NAME,
+    CLOUD_TASKS_GRPC_OPTIONS,
     ENV_WORKER_URL,
     ENV_CLOUD_TASKS_PROJECT_ID,
     ENV_CLOUD_TASKS_LOCATION,
@@ -22,12 +24,20 @@ from .constants import (
 
 logger = logging.getLogger(__name__)
 
+
+def _create_keepalive_channel(*args, options=(), **kwargs):
+    """Create the transport's gRPC channel with keepalive options added to its defaults."""
+    return CloudTasksGrpcTransport.create_channel(*args, options=[*options, *CLOUD_TASKS_GRPC_OPTIONS], **kwargs)
+
+
 class CloudTasksClient:
     """Client for managing Google Cloud Tasks"""
     
     def __init__(self):
         """Initialize the Cloud Tasks client"""
-        self.client = tasks_v2.CloudTasksClient()
+        self.client = tasks_v2.CloudTasksClient(
+            transport=CloudTasksGrpcTransport(channel=_create_keepalive_channel)
+        )
         # Read from environment variables with fallback to constants
         self.project_id = os.environ.get(ENV_CLOUD_TASKS_PROJECT_ID, CLOUD_TASKS_PROJECT_ID)
         self.location = os.environ.get(ENV_CLOUD_TASKS_LOCATION, CLOUD_TASKS_LOCATION)
@@ -35,6 +45,11 @@ class CloudTasksClient:
         self.queue_path = self.client.queue_path(
             self.project_id, self.location, self.queue_name
         )
+        # Task names are "<queue path>/tasks/<id>"; built by concatenation instead of the path template
+        self.task_path_prefix = f"{self.queue_path}/tasks/"
+        # Resolved once; every task targets the same worker URL
+        self.worker_url = os.environ.get(ENV_WORKER_URL, "https://worker-service-url")
+        logger.info("worker_url: %s", self.worker_url)
         
     def schedule_job(self, job: Dict[str, Any], scheduled_at: datetime) -> Optional[str]:
         """
@@ -48,9 +63,6 @@ class CloudTasksClient:
             Task name if successful, None if failed
         """
         try:
-            # Get worker URL from environment
-            worker_url = os.environ.get(ENV_WORKER_URL, "https://worker-service-url")
-            logger.info("worker_url: %s", worker_url)
             # Convert datetime to timestamp
             timestamp = timestamp_pb2.Timestamp()
             timestamp.FromDatetime(scheduled_at)
@@ -59,7 +71,7 @@ class CloudTasksClient:
             task = {
                 "http_request": {
                     "http_method": tasks_v2.HttpMethod.POST,
-                    "url": worker_url,
+                    "url": self.worker_url,
                     "headers": {
                         "Content-Type": "application/json",
                     },
@@ -68,12 +80,7 @@ class CloudTasksClient:
                 # Schedule the task for future execution
                 "schedule_time": timestamp,
                 # Add task name for deduplication
-                "name": self.client.task_path(
-                    self.project_id, 
-                    self.location, 
-                    self.queue_name, 
-                    job["runId"]
-                ),
+                "name": self.task_path_prefix + job["runId"],
             }
             
             # Create the task
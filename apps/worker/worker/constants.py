@@ -13,7 +13,20 @@ REQUEST_TIMEOUT = 30
 DEFAULT_MAX_PAGES = 200
 DEFAULT_MAX_DEPTH = 2
 DEFAULT_CRAWL_DELAY = 0.5
-DEFAULT_BATCH_SIZE = 10
+CRAWL_CONCURRENCY = 8  # pages fetched at once by the crawl; starts are still spaced by the crawl delay
+CHANGE_DETECTION_MAX_WORKERS = 32  # threads fetching pages during change detection
+MAX_REQUESTS_PER_HOST = 8  # concurrent fetches allowed against a single host
+SITEMAP_FETCH_WORKERS = 16  # sub-sitemaps of a sitemap index fetched in parallel
+HTTP_POOL_SIZE = 64  # keep-alive connections kept per host by the change detection session
+HTTP_MAX_RETRIES = 2
+HTTP_RETRY_BACKOFF = 0.2
+URL_CACHE_SIZE = 65536  # normalized/parsed URLs memoized during change detection
+STREAM_CHUNK_SIZE = 64 * 1024  # bytes read at a time when streaming page bodies
+MAX_PAGE_BYTES = 5 * 1024 * 1024  # crawled pages with larger bodies are skipped
+
+# Algorithm behind page_revisions.content_sha256, tagged in revision metadata so
+# hashes from different algorithms are never compared
+CONTENT_HASH_ALGORITHM = "sha256"
 
 # Content types
 HTML_CONTENT_TYPES = {"text/html", "application/xhtml+xml"}
@@ -22,11 +35,24 @@ HTML_CONTENT_TYPES = {"text/html", "application/xhtml+xml"}
 S3_BUCKET_NAME = "llms-txt"
 S3_REGION = "us-west-1"
 DEFAULT_CONTENT_TYPE = "text/plain"
+S3_MAX_POOL_CONNECTIONS = 32
+S3_MAX_RETRY_ATTEMPTS = 3
+S3_MULTIPART_THRESHOLD = 8 * 1024 * 1024  # 8MB; smaller bodies go up in a single put_object
+S3_MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+S3_MAX_TRANSFER_CONCURRENCY = 8
 
 # Cloud Tasks - Default values (can be overridden by environment variables)
 CLOUD_TASKS_PROJECT_ID = "api-project-1042553923996"
 CLOUD_TASKS_LOCATION = "us-west1"
 CLOUD_TASKS_QUEUE_NAME = "llms-txt"
+# Keepalive pings on the Cloud Tasks gRPC channel, so a connection dropped while idle between
+# runs is noticed before the next create_task; kept slow enough for Google frontends' ping limits
+CLOUD_TASKS_GRPC_OPTIONS = [
+    ("grpc.keepalive_time_ms", 60000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
 
 # Run statuses
 RUN_STATUS_QUEUED = "QUEUED"
@@ -53,6 +79,11 @@ TABLE_ARTIFACTS = "artifacts"
 TABLE_WEBHOOKS = "webhooks"
 TABLE_WEBHOOK_EVENTS = "webhook_events"
 
+# Rows per request when reading a whole project's pages; PostgREST caps responses at 1000 rows by default
+DB_PAGE_SIZE = 1000
+# Page revisions inserted per request when saving a run's revisions in bulk (rows carry full page HTML)
+REVISION_INSERT_BATCH_SIZE = 50
+
 # Artifact types
 ARTIFACT_TYPE_LLMS_TXT = "LLMS_TXT"
 
@@ -73,6 +104,8 @@ ENV_PORT = "PORT"
 ENV_CRAWL_MAX_PAGES = "CRAWL_MAX_PAGES"
 ENV_CRAWL_MAX_DEPTH = "CRAWL_MAX_DEPTH"
 ENV_CRAWL_DELAY = "CRAWL_DELAY"
+ENV_WORKER_CONCURRENCY = "WORKER_CONCURRENCY"
+ENV_WEB_CONCURRENCY = "WEB_CONCURRENCY"
 # Cloud Tasks environment variables
 ENV_CLOUD_TASKS_PROJECT_ID = "CLOUD_TASKS_PROJECT_ID"
 ENV_CLOUD_TASKS_LOCATION = "CLOUD_TASKS_LOCATION"
@@ -81,6 +114,16 @@ ENV_CLOUD_TASKS_QUEUE_NAME = "CLOUD_TASKS_QUEUE_NAME"
 # Default port
 DEFAULT_PORT = 8080
 
+# Number of jobs processed in parallel by one worker process
+DEFAULT_WORKER_CONCURRENCY = 4
+
+# Number of HTTP server processes sharing the port via SO_REUSEPORT
+DEFAULT_WEB_CONCURRENCY = 1
+
+# Seconds running jobs get to finish on shutdown before their workers are killed
+# (Cloud Run allows 10s between SIGTERM and SIGKILL)
+SHUTDOWN_GRACE_SECONDS = 8
+
 # Content extraction patterns (simplified)
 
 # Sitemap XML namespace
@@ -4,13 +4,26 @@
 import re
 import time
 import logging
-from urllib.parse import urlparse, urljoin, urldefrag
-from typing import Dict, List, Optional, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import urlparse, urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+from typing import Dict, List, Optional, Any, Tuple
 
+import lxml.html
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from .change_detection import ChangeDetector
+from .change_detection import (
+    ChangeDetector,
+    _decode_body,
+    parse_html,
+    raw_content_hash,
+    response_validators,
+    skipped_content_reason
+)
 from .data_fetcher import DataFetcher
 from .constants import (
     DEFAULT_USER_AGENT,
@@ -18,25 +31,56 @@ from .constants import (
     DEFAULT_MAX_PAGES,
     DEFAULT_MAX_DEPTH,
     DEFAULT_CRAWL_DELAY,
-    DEFAULT_TIMEOUT
+    DEFAULT_TIMEOUT,
+    CRAWL_CONCURRENCY,
+    HTTP_POOL_SIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_RETRY_BACKOFF,
+    MAX_PAGE_BYTES,
+    STREAM_CHUNK_SIZE
 )
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)  # Set appropriate log level
 
 
+# Shared by crawls in this process, so runs against the same site reuse keep-alive connections
+_session: Optional[requests.Session] = None
+
+
+def get_crawl_session() -> requests.Session:
+    """Get or create the process-wide crawl session."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        session.headers.update({"User-Agent": DEFAULT_USER_AGENT})
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_SIZE,
+            pool_maxsize=HTTP_POOL_SIZE,
+            # Retry transient server errors, then hand back the last response as before
+            max_retries=Retry(total=HTTP_MAX_RETRIES, backoff_factor=HTTP_RETRY_BACKOFF,
+                              status_forcelist=(500, 502, 503, 504), raise_on_status=False)
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session = session
+    return _session
+
+
 class Robots:
     """
-    Minimal robots.txt parser using requests + urllib.robotparser-like interface.
+    robots.txt checks for one site: fetched with our session, parsed by urllib.robotparser.
     """
 
     def __init__(self, base_url: str, session: requests.Session, user_agent: str = DEFAULT_USER_AGENT):
         self.base_url = base_url
         self.session = session
         self.user_agent = user_agent
-        self._allowed_cache = {}
+        self._allowed_cache: Dict[str, bool] = {}
         self._fetched = False
         self._rules_lines: List[str] = []
+        # Parsed from _rules_lines on first use
+        self._parser: Optional[RobotFileParser] = None
 
     def fetch(self):
         parsed = urlparse(self.base_url)
@@ -49,54 +93,38 @@ class Robots:
                 self._rules_lines = []
         except Exception:
             self._rules_lines = []
+        self._parser = None
+        self._allowed_cache.clear()
         self._fetched = True
 
+    def _parse_rules(self) -> RobotFileParser:
+        """Parse the fetched robots.txt lines."""
+        parser = RobotFileParser()
+        parser.parse(self._rules_lines)
+        return parser
+
     def allows(self, path: str) -> bool:
         """
-        Very simple interpretation: look for Disallow directives for User-agent: * and for our UA.
-        If robots.txt absent or cannot be parsed, return True by default.
-        This is conservative but practical for many sites.
+        Whether our user agent may fetch a path, following the group for our UA or User-agent: *.
+        If robots.txt is absent or has no matching rules, return True.
         """
         if not self._fetched:
             self.fetch()
 
-        ua = None
-        allow = True
-        rules_for_us: List[str] = []
-        current_ua_groups: List[str] = []
-        for raw in self._rules_lines:
-            line = raw.strip()
-            if not line or line.startswith("#"):
-                continue
-            parts = line.split(":", 1)
-            if len(parts) != 2:
-                continue
-            key, val = parts[0].strip().lower(), parts[1].strip()
-            if key == "user-agent":
-                ua = val
-                current_ua_groups = [ua]
-                continue
-            if key in ("disallow", "allow"):
-                p = val
-                # choose if this rule applies
-                if ua in ("*", self.user_agent) or ua == "*":
-                    # collect rules only for the relevant user-agent group
-                    rules_for_us.append((key, p))
-
-        # apply Disallow rules: if any disallow prefix matches the path => disallowed
-        # Note: a full robots parser is complex; this suffices for typical cases.
-        for key, pattern in rules_for_us:
-            if not pattern:
-                # Disallow: <empty> means allow all
-                if key == "disallow":
-                    continue
-            # normalize both
-            if path.startswith(pattern):
-                if key == "disallow":
-                    return False
-                if key == "allow":
-                    return True
-        return True
+        # robots.txt is parsed once per fetch and each path decided once
+        cached = self._allowed_cache.get(path)
+        if cached is not None:
+            return cached
+        if self._parser is None:
+            self._parser = self._parse_rules()
+        allowed = self._parser.can_fetch(self.user_agent, path)
+        self._allowed_cache[path] = allowed
+        return allowed
+
+
+# Links with these prefixes never lead to a crawlable page, so they're rejected before any parsing
+_SKIPPED_SCHEMES = ("mailto:", "tel:", "javascript:", "data:", "vbscript:")
+_HTTP_SCHEMES = frozenset(("http", "https"))
 
 
 def normalize_url(base: str, link: str) -> Optional[str]:
@@ -107,58 +135,155 @@ def normalize_url(base: str, link: str) -> Optional[str]:
     if not link:
         return None
     link = link.strip()
-    if link.startswith("mailto:") or link.startswith("tel:") or link.startswith("javascript:"):
+    if link.startswith(_SKIPPED_SCHEMES):
         return None
-    joined = urljoin(base, link)
-    joined, _ = urldefrag(joined)  # remove fragment
-    parsed = urlparse(joined)
-    if parsed.scheme not in ("http", "https"):
+    # Everything after the first '#' is the fragment, so a split avoids urldefrag's extra parse
+    joined = urljoin(base, link).split("#", 1)[0]
+    if urlsplit(joined).scheme not in _HTTP_SCHEMES:
         return None
     return joined
 
 
+@lru_cache(maxsize=16)
+def _hostname(url: str) -> Optional[str]:
+    """Hostname of a URL, cached because the crawl seed is checked for every link."""
+    return urlsplit(url).hostname
+
+
 def is_same_domain(seed: str, url: str) -> bool:
     """Check if two URLs are from the same domain, ignoring ports."""
-    seed_parsed = urlparse(seed)
-    url_parsed = urlparse(url)
+    return _hostname(seed) == urlsplit(url).hostname
+
+
+def _meta_from_tree(root: lxml.html.HtmlElement) -> Dict[str, Any]:
+    """Read the title and meta description from a parsed page."""
+    title_tag = root.find(".//title")
+    title = title_tag.text_content().strip() if title_tag is not None else ""
     
-    # Extract hostname without port
-    seed_hostname = seed_parsed.hostname
-    url_hostname = url_parsed.hostname
+    # meta description
+    meta_desc = ""
+    md = root.xpath('(//meta[@name="description"])[1]')
+    if md and md[0].get("content"):
+        meta_desc = md[0].get("content").strip()
     
-    return seed_hostname == url_hostname
+    return {"title": title, "description": meta_desc}
 
 
 def extract_text_and_meta(html: str, url: str) -> Dict[str, Any]:
     """Extract only the metadata needed for LLMS.txt generation."""
-    soup = BeautifulSoup(html, "lxml")
-    title_tag = soup.find("title")
-    title = title_tag.get_text(strip=True) if title_tag else ""
+    # lxml directly: only two elements are needed, so BeautifulSoup's tree on top of it is wasted work
+    root = parse_html(html)
+    if root is None:
+        return {"title": "", "description": ""}
+    return _meta_from_tree(root)
+
+
+class _RequestPacer:
+    """Spaces request starts at least `delay` seconds apart across threads, without waiting for responses."""
     
-    # meta description
-    meta_desc = ""
-    md = soup.find("meta", attrs={"name": "description"})
-    if md and md.get("content"):
-        meta_desc = md.get("content").strip()
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._next_start = time.monotonic()
+        self._lock = threading.Lock()
     
-    return {"title": title, "description": meta_desc}
+    def wait(self):
+        """Block until this caller's start slot comes up."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.delay
+        if start > now:
+            time.sleep(start - now)
 
 
-def _create_page_record(data_fetcher: DataFetcher, project_id: str, page_info: Dict) -> Optional[str]:
-    """Create a new page record in the database."""
+def _fetch_page(session: requests.Session, url: str, pacer: _RequestPacer) -> Optional[Tuple[requests.Response, Optional[bytes]]]:
+    """
+    Fetch one page for the crawl, once the pacer allows.
+    Returns the response and its body; the body is None for pages whose content isn't stored
+    (non-HTML, or over MAX_PAGE_BYTES). Returns None unless the page answers 200.
+    """
+    pacer.wait()
+    logger.info("Crawling changed/new page: %s", url)
+    # Streamed, so non-HTML and oversized pages are dropped before their body is downloaded
+    r = session.get(url, timeout=DEFAULT_TIMEOUT, stream=True)
     try:
-        page_id = data_fetcher.create_page_record(project_id, page_info)
+        if r.status_code != 200:
+            logger.warning("Failed to fetch %s: %s", url, r.status_code)
+            return None
         
-        if page_id:
-            logger.info(f"Created new page record {page_id} for {page_info['url']}")
-        else:
-            logger.error(f"Failed to create page record for {page_info['url']}")
+        skip_reason = skipped_content_reason(r.headers)
+        if skip_reason:
+            logger.info("Not storing %s: %s", url, skip_reason)
+            return r, None
         
-        return page_id
+        # Content-Length may be absent (chunked responses), so the cap is enforced while reading too
+        chunks = []
+        size = 0
+        for chunk in r.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_PAGE_BYTES:
+                logger.warning("Not storing oversized page %s (over %s bytes)", url, MAX_PAGE_BYTES)
+                return r, None
+            chunks.append(chunk)
+        return r, b"".join(chunks)
+    finally:
+        r.close()
+
+
+def _fetch_and_extract(session: requests.Session, page_info: Dict, pacer: _RequestPacer,
+                       change_detector: ChangeDetector) -> Optional[Dict[str, Any]]:
+    """
+    Fetch a page and do its CPU work (decoding, parsing, hashing) on the fetch thread.
+    Returns the page's revision fields, {"skipped": True} for pages whose content isn't
+    stored, or None if it wasn't fetched.
+    """
+    fetched = _fetch_page(session, page_info['url'], pacer)
+    if fetched is None:
+        return None
+    r, body = fetched
+    if body is None:
+        # Still answered 200: the page record is kept, just without stored content
+        return {"skipped": True}
+    html = _decode_body(r, body)
+    
+    # Extract metadata
+    root = parse_html(html)
+    data = _meta_from_tree(root) if root is not None else {"title": "", "description": ""}
+    
+    # Pages fetched during change detection were hashed then; new pages are
+    # hashed from the tree just parsed instead of parsing the HTML a second time
+    content_hash = page_info.get('new_content_hash')
+    if content_hash is None and root is not None:
+        content_hash = change_detector.content_hash_from_tree(root)
+    
+    return {
+        "content": html,
+        "title": data["title"],
+        "description": data["description"],
+        "content_hash": content_hash,
+        "metadata": {
+            # Let the next change check skip unchanged pages cheaply
+            "raw_content_sha256": raw_content_hash(body),
+            **response_validators(r.headers)
+        }
+    }
+
+
+def _create_page_records(data_fetcher: DataFetcher, project_id: str, page_infos: List[Dict]) -> Dict[str, str]:
+    """Create page records for newly discovered pages; returns {url: page_id}."""
+    try:
+        page_ids = data_fetcher.create_page_records(project_id, page_infos)
+        
+        logger.info(f"Created {len(page_ids)} new page records")
+        for page_info in page_infos:
+            if page_info['url'] not in page_ids:
+                logger.error(f"Failed to create page record for {page_info['url']}")
+        
+        return page_ids
             
     except Exception as e:
-        logger.error(f"Error creating page record for {page_info['url']}: {e}")
-        return None
+        logger.error(f"Error creating page records: {e}")
+        return {}
 
 
 def crawl_with_change_detection(
@@ -177,14 +302,22 @@ def crawl_with_change_detection(
     Only crawls pages that have changed or are new.
     """
     if session is None:
-        session = requests.Session()
-    session.headers.update({"User-Agent": user_agent})
+        session = get_crawl_session()
+        # Start every crawl with an empty cookie jar, as a per-crawl session would: cookies left
+        # by earlier jobs (consent, A/B variants, logins) would change the HTML that gets hashed
+        session.cookies.clear()
+    # The shared session already carries the default user agent
+    if session.headers.get("User-Agent") != user_agent:
+        session.headers.update({"User-Agent": user_agent})
 
     # Initialize change detector with data fetcher
     change_detector = ChangeDetector(project_id, run_id, data_fetcher)
     
-    # Detect changes first
-    changes = change_detector.detect_changes(start_url)
+    # Detect changes first; only detection uses the detector's HTTP session
+    try:
+        changes = change_detector.detect_changes(start_url)
+    finally:
+        change_detector.close()
     
     if not changes['has_changes']:
         logger.info("No changes detected, skipping crawl")
@@ -205,7 +338,6 @@ def crawl_with_change_detection(
     
     # Crawl only changed and new pages
     pages_to_crawl = changes['changed_pages'] + changes['new_pages']
-    crawled_pages = []
     
     # Ensure start_url is always included if it's in the pages to crawl
     # This is important for LLMS generator to create accurate headers
@@ -226,58 +358,95 @@ def crawl_with_change_detection(
             pages_to_crawl_with_priority.append(page_info)
             remaining_slots -= 1
     
+    # Old revisions to compare hashes against: change detection already loaded most of
+    # them, the rest are fetched in a single query instead of one per saved page
+    old_revisions = {}
+    missing_revision_ids = []
     for page_info in pages_to_crawl_with_priority:
-        url = page_info['url']
-        logger.info(f"Crawling changed/new page: {url}")
+        old_revision_id = page_info.get('old_revision_id')
+        if not old_revision_id:
+            continue
+        current_revision = page_info.get('current_revision')
+        if current_revision and current_revision.get('id') == old_revision_id:
+            old_revisions[old_revision_id] = current_revision
+        else:
+            missing_revision_ids.append(old_revision_id)
+    if missing_revision_ids:
+        old_revisions.update(data_fetcher.get_revisions_by_ids(missing_revision_ids))
+    
+    revisions_to_save = []
+    fetched_pages = []
+    new_page_infos = []
+    # Fetches overlap (the crawl is network-bound) while the pacer keeps request starts `delay`
+    # apart, so the site sees the same request rate as a sequential crawl. Each page is also
+    # parsed and hashed on its fetch thread (lxml releases the GIL while parsing); results are
+    # collected here in crawl order, keeping DB writes on this thread
+    pacer = _RequestPacer(delay)
+    with ThreadPoolExecutor(max_workers=max(1, min(CRAWL_CONCURRENCY, len(pages_to_crawl_with_priority)))) as executor:
+        futures = [executor.submit(_fetch_and_extract, session, page_info, pacer, change_detector)
+                   for page_info in pages_to_crawl_with_priority]
         
-        try:
-            # Fetch page
-            r = session.get(url, timeout=DEFAULT_TIMEOUT)
-            if r.status_code != 200:
-                logger.warning(f"Failed to fetch {url}: {r.status_code}")
-                continue
-            
-            # Extract metadata
-            data = extract_text_and_meta(r.text, url)
-            
-            # Handle page creation/update
-            page_id = page_info.get('id')
-            old_revision_id = page_info.get('old_revision_id')
+        for page_info, future in zip(pages_to_crawl_with_priority, futures):
+            url = page_info['url']
             
-            if not page_id:
-                # This is a new page, we need to create it first
-                page_id = _create_page_record(data_fetcher, project_id, page_info)
-                old_revision_id = None  # New page has no old revision
-            
-            if page_id:
-                # Save revision with minimal metadata
-                revision_id = change_detector.save_page_revision(
-                    page_id=page_id,
-                    content=r.text,
-                    title=data["title"],
-                    description=data["description"],
-                    metadata={
-                        "change_reason": page_info.get('change_reason', 'Unknown')
-                    },
-                    old_revision_id=old_revision_id
-                )
+            try:
+                page = future.result()
+                if page is None:
+                    continue
                 
-                if revision_id:
-                    # Add to crawled pages for result
-                    crawled_pages.append({
-                        "url": url,
-                        "title": data["title"],
-                        "description": data["description"],
-                        "page_id": page_id,
-                        "revision_id": revision_id
-                    })
-            
-            # Rate limiting
-            time.sleep(delay)
-            
-        except Exception as e:
-            logger.warning(f"Error crawling {url}: {e}")
-            continue
+                # Handle page creation/update
+                page_id = page_info.get('id')
+                old_revision_id = page_info.get('old_revision_id')
+                
+                if page.get("skipped"):
+                    # Record new skipped pages so they aren't reported as new on every run;
+                    # change detection leaves them unchanged from then on
+                    if not page_id:
+                        new_page_infos.append({
+                            **page_info,
+                            "metadata": {**(page_info.get('metadata') or {}), "content_skipped": True}
+                        })
+                    continue
+                
+                if not page_id:
+                    # New pages are created together after the loop and have no old revision
+                    new_page_infos.append(page_info)
+                    old_revision_id = None
+                
+                # Queue the revision with minimal metadata; revisions are written in bulk below
+                revisions_to_save.append({
+                    "page_id": page_id,
+                    "content": page["content"],
+                    "title": page["title"],
+                    "description": page["description"],
+                    "metadata": {"change_reason": page_info.get('change_reason', 'Unknown'), **page["metadata"]},
+                    "old_revision_id": old_revision_id,
+                    "content_hash": page["content_hash"],
+                    "cached_old_revision": old_revisions.get(old_revision_id)
+                })
+                fetched_pages.append({
+                    "url": url,
+                    "title": page["title"],
+                    "description": page["description"],
+                    "page_id": page_id
+                })
+                
+            except Exception as e:
+                logger.warning("Error crawling %s: %s", url, e)
+                continue
+    
+    # One round of bulk writes for the whole crawl instead of several calls per page
+    if new_page_infos:
+        new_page_ids = _create_page_records(data_fetcher, project_id, new_page_infos)
+        for revision, page in zip(revisions_to_save, fetched_pages):
+            if not revision["page_id"]:
+                revision["page_id"] = page["page_id"] = new_page_ids.get(page["url"])
+        revisions_to_save = [revision for revision in revisions_to_save if revision["page_id"]]
+    revision_ids = change_detector.save_page_revisions(revisions_to_save) if revisions_to_save else {}
+    crawled_pages = [
+        {**page, "revision_id": revision_ids[page["page_id"]]}
+        for page in fetched_pages if page["page_id"] in revision_ids
+    ]
     
     result = {
         "start_url": start_url,
@@ -16,6 +16,7 @@ from .constants import (
     TABLE_WEBHOOKS,
     TABLE_WEBHOOK_EVENTS,
     ARTIFACT_TYPE_LLMS_TXT,
+    DB_PAGE_SIZE,
     RUN_STATUS_IN_PROGRESS,
     RUN_STATUS_COMPLETE_NO_DIFFS,
     RUN_STATUS_COMPLETE_WITH_DIFFS,
@@ -73,6 +74,33 @@ class DataFetcher:
             logger.error(f"Error updating run times for project {project_id}: {e}")
             return False
     
+    def get_sitemap_cache(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """Get the sitemap validators and URL list cached by the project's last run."""
+        try:
+            result = self.supabase.table(TABLE_PROJECTS).select(
+                "sitemap_etag, sitemap_last_modified, sitemap_urls_cache"
+            ).eq("id", project_id).single().execute()
+            
+            return result.data if result.data else None
+        except Exception as e:
+            logger.error(f"Error fetching sitemap cache for project {project_id}: {e}")
+            return None
+    
+    def update_sitemap_cache(self, project_id: str, etag: Optional[str], last_modified: Optional[str],
+                             urls: List[str]) -> bool:
+        """Cache a project's sitemap validators and parsed URL list for the next run."""
+        try:
+            result = self.supabase.table(TABLE_PROJECTS).update({
+                "sitemap_etag": etag,
+                "sitemap_last_modified": last_modified,
+                "sitemap_urls_cache": urls
+            }).eq("id", project_id).execute()
+            
+            return bool(result.data)
+        except Exception as e:
+            logger.error(f"Error updating sitemap cache for project {project_id}: {e}")
+            return False
+    
     # Run Operations
     def create_run(self, project_id: str) -> Optional[str]:
         """Create a new run in the database and return the run ID."""
@@ -117,90 +145,91 @@ class DataFetcher:
     
     # Page Operations
     def get_existing_pages_with_revisions(self, project_id: str) -> List[Dict[str, Any]]:
-        """Get existing pages from database with their current revision info."""
+        """
+        Get existing pages from database with their current revision info.
+        Raises on error: an empty result would make every known page look new.
+        """
         try:
-            # First get all pages
-            result = self.supabase.table(TABLE_PAGES).select(
-                "id, url, path, canonical_url, current_revision_id, last_seen_at, render_mode, is_indexable, metadata"
-            ).eq("project_id", project_id).execute()
-            
-            if not result.data:
-                return []
-            
-            pages = result.data
-            
-            # Get current revisions for all pages in a batch
-            current_revision_ids = [page['current_revision_id'] for page in pages if page.get('current_revision_id')]
-            
-            revisions = {}
-            if current_revision_ids:
-                rev_result = self.supabase.table(TABLE_PAGE_REVISIONS).select(
-                    "id, page_id, content_sha256, created_at, metadata"
-                ).in_("id", current_revision_ids).execute()
+            # Embed each page's current revision through the current_revision_id FK, so the
+            # join runs server-side in the same round trip. Read in pages ordered by id, since a
+            # single request is truncated at the server's row limit
+            pages = []
+            offset = 0
+            while True:
+                result = self.supabase.table(TABLE_PAGES).select(
+                    "id, url, path, canonical_url, current_revision_id, last_seen_at, render_mode, is_indexable, metadata, "
+                    "current_revision:page_revisions!pages_current_revision_id_fkey(id, page_id, content_sha256, created_at, metadata)"
+                ).eq("project_id", project_id).order("id").range(offset, offset + DB_PAGE_SIZE - 1).execute()
                 
-                if rev_result.data:
-                    for revision in rev_result.data:
-                        revisions[revision['id']] = revision
-            
-            # Attach current revision info to each page
-            for page in pages:
-                current_revision_id = page.get('current_revision_id')
-                if current_revision_id and current_revision_id in revisions:
-                    page['current_revision'] = revisions[current_revision_id]
-                else:
-                    page['current_revision'] = None
-            
-            return pages
+                rows = result.data or []
+                pages.extend(rows)
+                if len(rows) < DB_PAGE_SIZE:
+                    return pages
+                offset += DB_PAGE_SIZE
         except Exception as e:
             logger.error(f"Error getting existing pages with revisions: {e}")
-            return []
+            raise
     
-    def create_page_record(self, project_id: str, page_info: Dict[str, Any]) -> Optional[str]:
-        """Create a new page record in the database."""
+    def create_page_records(self, project_id: str, page_infos: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Create several page records in one insert, leaving pages that already exist untouched.
+        Returns {url: page_id} for the rows created, or already present for the project.
+        """
         try:
-            page_data = {
+            discovered_at = datetime.now(timezone.utc).isoformat()
+            rows = [{
                 'project_id': project_id,
                 'url': page_info['url'],
                 'path': page_info.get('path', '/'),
                 'canonical_url': page_info.get('canonical_url', page_info['url']),
                 'render_mode': page_info.get('render_mode', 'STATIC'),
                 'is_indexable': page_info.get('is_indexable', True),
-                'discovered_at': datetime.now(timezone.utc).isoformat(),
+                'discovered_at': discovered_at,
                 'metadata': page_info.get('metadata', {})
-            }
+            } for page_info in page_infos]
             
-            result = self.supabase.table(TABLE_PAGES).insert(page_data).execute()
+            # Skip rows that hit UNIQUE(project_id, url) instead of failing the whole insert or
+            # overwriting the existing page's discovered_at and metadata, then look up the ids
+            # of pages another run created in the meantime
+            result = self.supabase.table(TABLE_PAGES).upsert(
+                rows, on_conflict="project_id,url", ignore_duplicates=True
+            ).execute()
             
-            if result.data:
-                return result.data[0]['id']
-            return None
+            page_ids = {row['url']: row['id'] for row in result.data or []}
+            missing_urls = [row['url'] for row in rows if row['url'] not in page_ids]
+            if missing_urls:
+                existing = self.supabase.table(TABLE_PAGES).select("id, url").eq(
+                    "project_id", project_id
+                ).in_("url", missing_urls).execute()
+                page_ids.update({row['url']: row['id'] for row in existing.data or []})
+            
+            return page_ids
         except Exception as e:
-            logger.error(f"Error creating page record: {e}")
-            return None
+            logger.error(f"Error creating page records: {e}")
+            return {}
     
-    def update_page_last_seen(self, page_id: str) -> bool:
-        """Update the last_seen_at timestamp for a page."""
+    def update_pages_last_seen(self, page_ids: List[str]) -> bool:
+        """Update last_seen_at for several pages in one query."""
         try:
             result = self.supabase.table(TABLE_PAGES).update({
                 'last_seen_at': datetime.now(timezone.utc).isoformat()
-            }).eq('id', page_id).execute()
+            }).in_('id', list(page_ids)).execute()
             
             return bool(result.data)
         except Exception as e:
-            logger.error(f"Error updating last_seen_at for page {page_id}: {e}")
+            logger.error(f"Error updating last_seen_at for pages {page_ids}: {e}")
             return False
     
-    def update_page_revision(self, page_id: str, revision_id: str) -> bool:
-        """Update a page's current_revision_id and last_seen_at."""
+    def update_pages_current_revision(self, revision_ids_by_page: Dict[str, str]) -> bool:
+        """Point several pages at new current revisions (and bump last_seen_at) in one call."""
         try:
-            result = self.supabase.table(TABLE_PAGES).update({
-                'current_revision_id': revision_id,
-                'last_seen_at': datetime.now(timezone.utc).isoformat()
-            }).eq('id', page_id).execute()
-            
-            return bool(result.data)
+            self.supabase.rpc('set_pages_current_revision', {
+                'page_ids': list(revision_ids_by_page),
+                'revision_ids': list(revision_ids_by_page.values())
+            }).execute()
+            return True
         except Exception as e:
-            logger.error(f"Error updating page revision for {page_id}: {e}")
+            logger.error(f"Error updating current revisions for pages {list(revision_ids_by_page)}: {e}")
             return False
     
     # Page Revision Operations
@@ -218,29 +247,43 @@ class DataFetcher:
             logger.error(f"Error getting revision {revision_id}: {e}")
             return None
     
-    def create_page_revision(self, page_id: str, run_id: str, content: str, 
-                           content_hash: str, title: str = "", description: str = "", 
-                           metadata: Dict = None) -> Optional[str]:
-        """Create a new page revision in the database."""
+    def get_revisions_by_ids(self, revision_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get several revisions in one query, keyed by ID, with just the columns hash comparison needs."""
+        if not revision_ids:
+            return {}
         try:
-            revision_data = {
-                'page_id': page_id,
+            result = self.supabase.table(TABLE_PAGE_REVISIONS).select("id, content_sha256, metadata").in_(
+                "id", list(revision_ids)
+            ).execute()
+            
+            return {revision['id']: revision for revision in result.data or []}
+        except Exception as e:
+            logger.error(f"Error getting revisions {revision_ids}: {e}")
+            return {}
+    
+    def create_page_revisions(self, run_id: str, revisions: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Create revisions for several pages in one insert.
+        Each item has page_id, content, content_hash, title, description and metadata.
+        Returns {page_id: revision_id} for the rows created.
+        """
+        try:
+            rows = [{
+                'page_id': revision['page_id'],
                 'run_id': run_id,
-                'content': content,
-                'content_sha256': content_hash,
-                'title': title,
-                'meta_description': description,
-                'metadata': metadata or {}
-            }
+                'content': revision['content'],
+                'content_sha256': revision['content_hash'],
+                'title': revision.get('title', ''),
+                'meta_description': revision.get('description', ''),
+                'metadata': revision.get('metadata') or {}
+            } for revision in revisions]
             
-            result = self.supabase.table(TABLE_PAGE_REVISIONS).insert(revision_data).execute()
+            result = self.supabase.table(TABLE_PAGE_REVISIONS).insert(rows).execute()
             
-            if result.data:
-                return result.data[0]['id']
-            return None
+            return {row['page_id']: row['id'] for row in result.data or []}
         except Exception as e:
-            logger.error(f"Error creating page revision: {e}")
-            return None
+            logger.error(f"Error creating page revisions: {e}")
+            return {}
     
     # Artifact Operations
     def get_latest_llms_txt_url(self, project_id: str) -> Optional[str]:
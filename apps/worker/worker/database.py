@@ -11,13 +11,21 @@ from .constants import ENV_SUPABASE_URL, ENV_SUPABASE_KEY
 
 logger = logging.getLogger(__name__)
 
+# Global Supabase client so every DataFetcher in a process shares one HTTP connection pool
+_client: Optional[Client] = None
+
 
 def get_supabase_client() -> Client:
-    """Get Supabase client using environment variables."""
+    """Get or create the global Supabase client using environment variables."""
+    global _client
+    if _client is not None:
+        return _client
+    
     url = os.environ.get(ENV_SUPABASE_URL)
     key = os.environ.get(ENV_SUPABASE_KEY)
     
     if not url or not key:
         raise ValueError(f"{ENV_SUPABASE_URL} and {ENV_SUPABASE_KEY} environment variables are required")
     
-    return create_client(url, key)
+    _client = create_client(url, key)
+    return _client
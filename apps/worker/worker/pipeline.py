@@ -0,0 +1,139 @@
+# apps/worker/worker/pipeline.py
+"""Job pipeline: crawl with change detection, generate llms.txt and store the result."""
+
+import os
+import logging
+
+from .crawler import crawl_with_change_detection
+from .llms_generator import generate_llms_text
+from .storage import maybe_upload_s3_from_memory, update_run_status
+from .scheduling import schedule_next_run
+from .data_fetcher import DataFetcher
+from .constants import (
+    ENV_CRAWL_MAX_PAGES,
+    ENV_CRAWL_MAX_DEPTH,
+    ENV_CRAWL_DELAY,
+    RUN_STATUS_IN_PROGRESS,
+    RUN_STATUS_COMPLETE_NO_DIFFS,
+    RUN_STATUS_FAILED,
+    LLMS_TXT_FILENAME_PREFIX,
+    LLMS_TXT_FILENAME_SUFFIX
+)
+
+logger = logging.getLogger(__name__)
+
+
+def load_crawl_opts() -> dict:
+    """Read crawl options from the environment."""
+    return {
+        "max_pages": int(os.environ.get(ENV_CRAWL_MAX_PAGES, 100)),
+        "max_depth": int(os.environ.get(ENV_CRAWL_MAX_DEPTH, 2)),
+        "delay": float(os.environ.get(ENV_CRAWL_DELAY, 0.5)),
+    }
+
+
+# Crawl options only change with the environment, so parse them once at startup
+CRAWL_OPTS = load_crawl_opts()
+
+
+def validate_job(job: dict) -> None:
+    """Raise ValueError if the job is missing any of its required fields."""
+    if not job.get("id") or not job.get("url") or not job.get("projectId") or not job.get("runId"):
+        raise ValueError("job must contain id+url+project id+run id")
+
+
+def run_job(job: dict) -> None:
+    """
+    Entry point for jobs submitted to the process pool.
+    Nobody waits on the returned future, so failures are logged and recorded on the run here
+    and the result is not pickled back to the server process.
+    """
+    try:
+        result = process_job_payload(job)
+        logger.info("Job %s finished (changes detected: %s)", job.get("id"), result.get("changes_detected"))
+    except Exception as e:
+        logger.exception("Job %s failed: %s", job.get("id"), e)
+        mark_run_failed(job, e)
+
+
+def mark_run_failed(job: dict, error: Exception) -> None:
+    """
+    Record a job that could not be completed as a FAILED run. Jobs are acknowledged
+    before they run, so Cloud Tasks won't retry them: a failed scheduled or initial
+    run schedules the project's next run itself to keep the schedule going.
+    """
+    try:
+        update_run_status(DataFetcher(), job.get("runId"), RUN_STATUS_FAILED, job.get("projectId"),
+                          job.get("isScheduled", False), job.get("isInitialRun", False), str(error))
+    except Exception:
+        logger.exception("Failed to mark run %s as failed", job.get("runId"))
+    if job.get("projectId") and (job.get("isScheduled") or job.get("isInitialRun")):
+        logger.info("Scheduling next run for project %s after failed run %s", job.get("projectId"), job.get("runId"))
+        try:
+            schedule_next_run(job.get("projectId"))
+        except Exception:
+            logger.exception("Failed to schedule next run for project %s", job.get("projectId"))
+
+
+def process_job_payload(job: dict):
+    """
+    Perform crawl + llms generation with change detection. Return dict with result metadata.
+    """
+    validate_job(job)
+    
+    job_id = job.get("id")
+    url = job.get("url")
+    project_id = job.get("projectId")
+    run_id = job.get("runId")
+    is_scheduled = job.get("isScheduled", False)  # Whether this is a scheduled job
+    is_initial_run = job.get("isInitialRun", False)  # Whether this is the initial run for a new project
+    
+    # Initialize data fetcher for all database operations
+    data_fetcher = DataFetcher()
+    
+    # Update run status to IN_PROGRESS
+    update_run_status(data_fetcher, run_id, RUN_STATUS_IN_PROGRESS, project_id, is_scheduled, is_initial_run)
+
+    # crawl site with change detection
+    logger.info("starting crawl with change detection for %s with opts %s", url, CRAWL_OPTS)
+    crawl_result = crawl_with_change_detection(
+        url, 
+        project_id, 
+        run_id, 
+        data_fetcher,
+        **CRAWL_OPTS
+    )
+    
+    # If no changes detected, we can skip llms.txt generation
+    if not crawl_result.get("changes_detected", True):
+        logger.info("No changes detected, skipping llms.txt generation")
+        update_run_status(data_fetcher, run_id, RUN_STATUS_COMPLETE_NO_DIFFS, project_id, is_scheduled, is_initial_run, "No changes detected, skipping generation")
+        return {
+            "s3_url_txt": None,
+            "pages_crawled": 0,
+            "local_files_deleted": True,
+            "changes_detected": False,
+            "message": "No changes detected"
+        }
+
+    logger.info("crawl finished: crawled %s pages", crawl_result.get("pages_crawled"))
+
+    # generate llms file in memory
+    txt_content = generate_llms_text(crawl_result, job_id)
+
+    # S3 upload with database updates directly from memory
+    changes_detected = crawl_result.get("changes_detected", True)
+    txt_filename = f"{LLMS_TXT_FILENAME_PREFIX}{job_id}{LLMS_TXT_FILENAME_SUFFIX}"
+    
+    s3_url_txt = maybe_upload_s3_from_memory(data_fetcher, txt_content, txt_filename, run_id, project_id, changes_detected, is_scheduled, is_initial_run)
+
+    result = {
+        "s3_url_txt": s3_url_txt,
+        "pages_crawled": crawl_result.get("pages_crawled"),
+        "local_files_deleted": True,  # Always true since we don't create local files
+        "changes_detected": crawl_result.get("changes_detected", True),
+        "changed_pages": crawl_result.get("changed_pages", []),
+        "new_pages": crawl_result.get("new_pages", []),
+        "unchanged_pages": crawl_result.get("unchanged_pages", [])
+    }
+    return result
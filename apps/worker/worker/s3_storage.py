@@ -1,12 +1,15 @@
 # apps/worker/worker/s3_storage.py
 """S3 storage operations for file uploads."""
 
+import io
 import os
 import logging
 from datetime import datetime
 from typing import Optional
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 
 from .constants import (
     ENV_SUPABASE_PROJECT_ID,
@@ -14,11 +17,46 @@ from .constants import (
     ENV_AWS_SECRET_ACCESS_KEY,
     S3_BUCKET_NAME,
     S3_REGION,
-    DEFAULT_CONTENT_TYPE
+    DEFAULT_CONTENT_TYPE,
+    S3_MAX_POOL_CONNECTIONS,
+    S3_MAX_RETRY_ATTEMPTS,
+    S3_MULTIPART_THRESHOLD,
+    S3_MULTIPART_CHUNKSIZE,
+    S3_MAX_TRANSFER_CONCURRENCY
 )
 
 logger = logging.getLogger(__name__)
 
+# Large llms.txt files are uploaded as parallel multipart chunks
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=S3_MULTIPART_THRESHOLD,
+    multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+    max_concurrency=S3_MAX_TRANSFER_CONCURRENCY,
+    use_threads=True,
+)
+
+# Global S3 client so uploads in the same process reuse pooled keep-alive connections
+_s3_client = None
+
+
+def get_s3_client():
+    """Get or create the global S3 client instance"""
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client(
+            service_name="s3",
+            endpoint_url=f"https://{os.environ.get(ENV_SUPABASE_PROJECT_ID)}.supabase.co/storage/v1/s3",
+            aws_access_key_id=os.environ.get(ENV_AWS_ACCESS_KEY_ID),
+            aws_secret_access_key=os.environ.get(ENV_AWS_SECRET_ACCESS_KEY),
+            region_name=S3_REGION,
+            config=Config(
+                max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                tcp_keepalive=True,
+                retries={"max_attempts": S3_MAX_RETRY_ATTEMPTS, "mode": "adaptive"},
+            ),
+        )
+    return _s3_client
+
 
 def upload_content_to_s3(content: str, filename: str) -> Optional[str]:
     """
@@ -36,25 +74,30 @@ def upload_content_to_s3(content: str, filename: str) -> Optional[str]:
         logger.info("S3 bucket not configured; skipping S3 upload")
         return None
 
-    s3_client = boto3.client(
-        service_name="s3",
-        endpoint_url=f"https://{os.environ.get(ENV_SUPABASE_PROJECT_ID)}.supabase.co/storage/v1/s3",
-        aws_access_key_id=os.environ.get(ENV_AWS_ACCESS_KEY_ID),
-        aws_secret_access_key=os.environ.get(ENV_AWS_SECRET_ACCESS_KEY),
-        region_name=S3_REGION,
-    )
+    s3_client = get_s3_client()
     
     key = filename
     extra_args = {"ACL": "private"}
     
+    body = content.encode('utf-8')
+    
     # Upload content directly from memory
-    s3_client.put_object(
-        Bucket=bucket,
-        Key=key,
-        Body=content.encode('utf-8'),
-        ContentType=DEFAULT_CONTENT_TYPE,
-        **extra_args
-    )
+    if len(body) >= S3_MULTIPART_THRESHOLD:
+        s3_client.upload_fileobj(
+            io.BytesIO(body),
+            bucket,
+            key,
+            ExtraArgs={"ContentType": DEFAULT_CONTENT_TYPE, **extra_args},
+            Config=TRANSFER_CONFIG
+        )
+    else:
+        s3_client.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=body,
+            ContentType=DEFAULT_CONTENT_TYPE,
+            **extra_args
+        )
 
     # Construct Supabase storage URL using the project ID
     supabase_project_id = os.environ.get(ENV_SUPABASE_PROJECT_ID)
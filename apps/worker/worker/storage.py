@@ -2,6 +2,7 @@
 """Storage operations for S3 uploads, database updates, and scheduling."""
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import Optional
 
@@ -130,6 +131,10 @@ def update_run_status(data_fetcher: DataFetcher, run_id: str, status: str, proje
                 else:
                     logger.warning(f"Failed to update last_run_at for project {project_id}")
             
+            # Scheduling and webhook delivery are independent network calls, so they're
+            # collected here and run concurrently below
+            follow_ups = []
+            
             # If run completed successfully and we have project_id, schedule the next run if:
             # 1. This is a scheduled run (is_scheduled=True), OR
             # 2. This is an initial run (is_initial_run=True)
@@ -138,30 +143,42 @@ def update_run_status(data_fetcher: DataFetcher, run_id: str, status: str, proje
                     logger.info(f"Scheduling next run for project {project_id} after successful completion of initial run {run_id}")
                 else:
                     logger.info(f"Scheduling next run for project {project_id} after successful completion of scheduled run {run_id}")
-                schedule_next_run(project_id)
+                follow_ups.append((schedule_next_run, project_id))
             elif status in [RUN_STATUS_COMPLETE_NO_DIFFS, RUN_STATUS_COMPLETE_WITH_DIFFS] and not is_scheduled and not is_initial_run:
                 logger.info(f"Skipping next run scheduling for immediate job run {run_id}")
             
-            # Call webhooks for completed runs
+            # Call webhooks for completed runs if one of the following conditions apply
+            # 1. This is a manual run
+            # 2. This is a scheduled run and diffs were detected.
             if status in [RUN_STATUS_COMPLETE_NO_DIFFS, RUN_STATUS_COMPLETE_WITH_DIFFS] and project_id:
-                # Determine the llms.txt URL to use
-                webhook_url = llms_txt_url
-                
-                # If no URL provided, query the artifacts table for the most recent one
-                if not webhook_url:
-                    webhook_url = get_latest_llms_txt_url(data_fetcher, project_id)
-                
-                # Call webhooks if we have a URL and one of the following conditions apply
-                # 1. This is a manual run
-                # 2. This is a scheduled run and diffs were detected.
-                if webhook_url and ((not is_scheduled) or (status == RUN_STATUS_COMPLETE_WITH_DIFFS)):
-                    logger.info(f"Calling webhooks for project {project_id} with llms.txt URL: {webhook_url}")
-                    call_webhooks_for_project(project_id, run_id, webhook_url)
+                if (not is_scheduled) or (status == RUN_STATUS_COMPLETE_WITH_DIFFS):
+                    # Determine the llms.txt URL to use
+                    webhook_url = llms_txt_url
+
+                    # If no URL provided, query the artifacts table for the most recent one
+                    if not webhook_url:
+                        webhook_url = get_latest_llms_txt_url(data_fetcher, project_id)
+
+                    if webhook_url:
+                        logger.info(f"Calling webhooks for project {project_id} with llms.txt URL: {webhook_url}")
+                        follow_ups.append((call_webhooks_for_project, project_id, run_id, webhook_url))
+                    else:
+                        logger.warning(f"No llms.txt URL available for webhook calls for project {project_id}")
                 else:
-                    logger.warning(f"No llms.txt URL available for webhook calls for project {project_id}")
+                    # Scheduled runs without diffs don't notify, so skip the artifacts lookup entirely
+                    logger.info(f"Skipping webhooks for scheduled run {run_id} with no diffs")
             elif status in [RUN_STATUS_COMPLETE_NO_DIFFS, RUN_STATUS_COMPLETE_WITH_DIFFS] and not project_id:
                 logger.warning(f"Run {run_id} completed but no project_id available for webhook calls")
             
+            if len(follow_ups) == 1:
+                func, *args = follow_ups[0]
+                func(*args)
+            elif follow_ups:
+                with ThreadPoolExecutor(max_workers=len(follow_ups)) as executor:
+                    futures = [executor.submit(*follow_up) for follow_up in follow_ups]
+                    for future in futures:
+                        future.result()
+            
             return True
         else:
             logger.error(f"Failed to update run {run_id} status")
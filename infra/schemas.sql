@@ -64,6 +64,13 @@ CREATE TABLE IF NOT EXISTS projects (
   metadata jsonb DEFAULT '{}'::jsonb
 );
 
+-- Sitemap validators and parsed URLs from the last run, so an unchanged
+-- sitemap.xml (304 Not Modified) doesn't have to be downloaded and parsed again
+ALTER TABLE projects
+  ADD COLUMN IF NOT EXISTS sitemap_etag text,
+  ADD COLUMN IF NOT EXISTS sitemap_last_modified text,
+  ADD COLUMN IF NOT EXISTS sitemap_urls_cache jsonb;
+
 CREATE TABLE IF NOT EXISTS project_configs (
   project_id uuid PRIMARY KEY REFERENCES projects(id) ON DELETE CASCADE,
   crawl_depth integer NOT NULL DEFAULT 2,
@@ -186,6 +193,20 @@ CREATE TABLE IF NOT EXISTS webhook_events (
 -- ======================================================
 CREATE INDEX IF NOT EXISTS idx_projects_metadata_gin ON projects USING gin (metadata jsonb_path_ops);
 
+-- ======================================================
+-- WORKER FUNCTIONS
+-- ======================================================
+-- Point many pages at their new current revision in one call (used by the
+-- worker after bulk-inserting a run's page revisions)
+CREATE OR REPLACE FUNCTION set_pages_current_revision(page_ids uuid[], revision_ids uuid[])
+RETURNS void AS $$
+  UPDATE pages p
+  SET current_revision_id = v.revision_id,
+      last_seen_at = now()
+  FROM unnest(page_ids, revision_ids) AS v(page_id, revision_id)
+  WHERE p.id = v.page_id;
+$$ LANGUAGE sql;
+
 -- ======================================================
 -- TRIGGER FUNCTION + TRIGGERS
 -- ======================================================